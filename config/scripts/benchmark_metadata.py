@@ -0,0 +1,346 @@
+## Reproducible benchmark for the metadata maintenance scripts.
+# Provisions a throwaway local PostgreSQL cluster (initdb + pg_ctl, unix socket only) with the minimal
+# `metadatafieldregistry` / `metadatavalue` schema, generates synthetic repositories whose subjects are
+# drawn from the vocabularies in `config/xmls/`, and runs `update_vocab.py` and `populate_subject_flat.py`
+# against a fresh copy of the data for every scenario.
+#
+# Every run records wall time, statements executed (counted from the server's statement log),
+# metadata rows per second and peak RSS of the script, and appends one JSON line per scenario to the
+# output file together with the git commit, so results can be compared across commits.
+#
+# Example:
+#   python benchmark_metadata.py --sizes 10000 100000 --output /tmp/metadata_bench.jsonl
+# PostgreSQL binaries are looked up on PATH or via `pg_config --bindir`; use `--pg-bin` to override.
+
+import argparse
+import io
+import json
+import logging
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+
+import psycopg2
+
+from update_vocab import iter_paths
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+XML_DIR = os.path.join(SCRIPT_DIR, '..', 'xmls')
+DEFAULT_VOCABULARIES = ['dc_subject_study.xml', 'dc_subject_mesh.xml']
+DB_USER = 'bench'
+TEMPLATE_DB = 'bench_template'
+
+# Subject values per item and the share of them stored as bare labels (to be rewritten by update_vocab.py).
+SUBJECTS_PER_ITEM = 4
+BARE_LABEL_RATIO = 0.5
+
+# Scenario name -> (script, extra arguments). Every scenario runs against a fresh copy of the data.
+SCENARIOS = {
+    'update_vocab': ('update_vocab.py', []),
+    'update_vocab_bulk': ('update_vocab.py', ['--bulk']),
+    'update_vocab_plan': ('update_vocab.py', ['--plan']),
+    'populate_subject_flat': ('populate_subject_flat.py', ['--stdout']),
+    'populate_subject_flat_stream': ('populate_subject_flat.py', ['--stdout', '--stream']),
+    'populate_subject_flat_server_side': ('populate_subject_flat.py', ['--stdout', '--server-side']),
+    'metadata_pipeline': ('metadata_pipeline.py', []),
+}
+
+SCHEMA_SQL = """
+    CREATE TABLE metadataschemaregistry (
+        metadata_schema_id serial PRIMARY KEY,
+        namespace varchar(256),
+        short_id varchar(32)
+    );
+    CREATE TABLE metadatafieldregistry (
+        metadata_field_id serial PRIMARY KEY,
+        metadata_schema_id integer NOT NULL,
+        element varchar(64),
+        qualifier varchar(64),
+        scope_note text
+    );
+    CREATE TABLE metadatavalue (
+        metadata_value_id serial PRIMARY KEY,
+        metadata_field_id integer REFERENCES metadatafieldregistry (metadata_field_id),
+        text_value text,
+        text_lang varchar(24),
+        place integer DEFAULT 1,
+        authority varchar(100),
+        confidence integer DEFAULT -1,
+        dspace_object_id uuid
+    );
+    CREATE INDEX metadatavalue_field_fk_idx ON metadatavalue (metadata_field_id);
+    CREATE INDEX metadatavalue_dso_uuid_idx ON metadatavalue (dspace_object_id);
+    INSERT INTO metadataschemaregistry (namespace, short_id) VALUES
+        ('http://dublincore.org/documents/dcmi-terms/', 'dc'),
+        ('http://dspace.org/namespace/local/', 'local');
+    INSERT INTO metadatafieldregistry (metadata_schema_id, element, qualifier) VALUES
+        (1, 'title', NULL),
+        (1, 'subject', NULL),
+        (2, 'subject', 'flat');
+"""
+
+
+def find_pg_bin(pg_bin=None):
+    """
+    Return the directory that holds initdb and pg_ctl.
+    """
+    if pg_bin:
+        return pg_bin
+    initdb = shutil.which('initdb')
+    if initdb:
+        return os.path.dirname(initdb)
+    try:
+        return subprocess.run(['pg_config', '--bindir'], check=True, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        sys.exit("Could not find initdb. Install PostgreSQL or pass --pg-bin.")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class ThrowawayPostgres:
+    """
+    A private PostgreSQL cluster in a temporary directory, reachable only through a unix socket.
+    All statements are logged so that the queries issued by a script can be counted.
+    """
+
+    def __init__(self, pg_bin, workdir):
+        self.pg_bin = pg_bin
+        self.data_dir = os.path.join(workdir, 'pgdata')
+        self.socket_dir = os.path.join(workdir, 'socket')
+        self.log_file = os.path.join(workdir, 'postgres.log')
+        self.port = free_port()
+
+    def start(self):
+        os.makedirs(self.socket_dir)
+        subprocess.run(
+            [os.path.join(self.pg_bin, 'initdb'), '-D', self.data_dir, '-U', DB_USER, '--auth=trust', '-E', 'UTF8'],
+            check=True, stdout=subprocess.DEVNULL
+        )
+        options = (
+            f"-p {self.port} -k {self.socket_dir} -c listen_addresses='' "
+            "-c log_statement=all -c log_min_duration_statement=-1 -c fsync=off"
+        )
+        subprocess.run(
+            [os.path.join(self.pg_bin, 'pg_ctl'), '-D', self.data_dir, '-l', self.log_file, '-o', options, '-w', 'start'],
+            check=True, stdout=subprocess.DEVNULL
+        )
+
+    def stop(self):
+        subprocess.run(
+            [os.path.join(self.pg_bin, 'pg_ctl'), '-D', self.data_dir, '-m', 'fast', '-w', 'stop'],
+            check=False, stdout=subprocess.DEVNULL
+        )
+
+    def connect(self, dbname='postgres'):
+        return psycopg2.connect(dbname=dbname, user=DB_USER, host=self.socket_dir, port=self.port)
+
+    def log_size(self):
+        return os.path.getsize(self.log_file)
+
+    def count_statements(self, since):
+        # Simple-protocol statements are logged as "statement:", prepared ones as "execute <name>:".
+        count = 0
+        with open(self.log_file, 'r', encoding='utf-8', errors='replace') as f:
+            f.seek(since)
+            for line in f:
+                if 'LOG:  statement: ' in line or 'LOG:  execute ' in line:
+                    count += 1
+        return count
+
+    def server_version(self):
+        with self.connect() as conn, conn.cursor() as cursor:
+            cursor.execute("SHOW server_version;")
+            return cursor.fetchone()[0]
+
+
+def load_terms(vocabularies):
+    """
+    Return the (label, full_path) pairs of the given vocabulary files in config/xmls/.
+    """
+    terms = []
+    for name in vocabularies:
+        terms.extend(iter_paths(os.path.join(XML_DIR, name)))
+    return terms
+
+
+def generate_rows(size, terms, seed):
+    """
+    Generate `size` metadatavalue rows as tab-separated COPY lines: one dc.title and
+    SUBJECTS_PER_ITEM dc.subject values per item. Half of the subjects are bare labels.
+    """
+    rng = random.Random(seed)
+    rows_per_item = 1 + SUBJECTS_PER_ITEM
+    buffer = io.StringIO()
+    for item in range(max(1, size // rows_per_item)):
+        dspace_object_id = uuid.UUID(int=rng.getrandbits(128), version=4)
+        buffer.write(f"{dspace_object_id}\t1\tSynthetic item {item}\t1\n")
+        for place, (label, full_path) in enumerate(rng.sample(terms, SUBJECTS_PER_ITEM), start=1):
+            value = label if rng.random() < BARE_LABEL_RATIO else full_path
+            value = value.replace('\\', '\\\\').replace('\t', ' ').replace('\n', ' ')
+            buffer.write(f"{dspace_object_id}\t2\t{value}\t{place}\n")
+    buffer.seek(0)
+    return buffer
+
+
+def create_template(server, size, terms, seed):
+    """
+    (Re)create the template database holding the synthetic repository of the given size.
+    """
+    admin = server.connect()
+    admin.autocommit = True
+    with admin.cursor() as cursor:
+        cursor.execute(f"DROP DATABASE IF EXISTS {TEMPLATE_DB};")
+        cursor.execute(f"CREATE DATABASE {TEMPLATE_DB};")
+    admin.close()
+
+    with server.connect(TEMPLATE_DB) as conn, conn.cursor() as cursor:
+        cursor.execute(SCHEMA_SQL)
+        cursor.copy_expert(
+            "COPY metadatavalue (dspace_object_id, metadata_field_id, text_value, place) FROM STDIN;",
+            generate_rows(size, terms, seed)
+        )
+        cursor.execute("SELECT COUNT(*) FROM metadatavalue;")
+        rows = cursor.fetchone()[0]
+    conn.close()
+
+    conn = server.connect(TEMPLATE_DB)
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute("VACUUM ANALYZE;")
+    conn.close()
+    logging.info(f"Created template repository with {rows} metadatavalue rows.")
+    return rows
+
+
+def fresh_database(server, name):
+    admin = server.connect()
+    admin.autocommit = True
+    with admin.cursor() as cursor:
+        cursor.execute(f"DROP DATABASE IF EXISTS {name};")
+        cursor.execute(f"CREATE DATABASE {name} TEMPLATE {TEMPLATE_DB};")
+    admin.close()
+
+
+def write_config(path, server, dbname, xml_file, cache_dir):
+    with open(path, 'w') as f:
+        f.write(
+            "[Database]\n"
+            f"dbname = {dbname}\n"
+            f"user = {DB_USER}\n"
+            "password = \n"
+            f"host = {server.socket_dir}\n"
+            f"port = {server.port}\n\n"
+            "[Paths]\n"
+            f"xml_file = {xml_file}\n"
+            f"cache_dir = {cache_dir}\n"
+        )
+
+
+def run_script(script, config_file, extra_args):
+    """
+    Run one script to completion. Returns (wall seconds, peak RSS in KiB, exit status).
+    """
+    command = [sys.executable, os.path.join(SCRIPT_DIR, script), '--config', config_file, *extra_args]
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=SCRIPT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    # wait4 reaps the child and returns its own resource usage, unlike RUSAGE_CHILDREN.
+    _pid, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return elapsed, usage.ru_maxrss, process.returncode
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=SCRIPT_DIR, check=True, capture_output=True, text=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--', SCRIPT_DIR], cwd=SCRIPT_DIR, capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark update_vocab.py and populate_subject_flat.py against a throwaway PostgreSQL.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000], help="Synthetic repository sizes in metadatavalue rows (default: 10000 100000).")
+    parser.add_argument('--vocabularies', nargs='+', default=DEFAULT_VOCABULARIES, help="Vocabulary files in config/xmls/ to draw subjects from.")
+    parser.add_argument('--vocabulary', default='dc_subject_study.xml', help="Vocabulary applied by update_vocab.py (default: dc_subject_study.xml).")
+    parser.add_argument('--scenarios', nargs='+', choices=sorted(SCENARIOS), default=sorted(SCENARIOS), help="Scenarios to run (default: all).")
+    parser.add_argument('--repeat', type=int, default=1, help="Runs per scenario and size (default: 1).")
+    parser.add_argument('--seed', type=int, default=42, help="Seed for the synthetic data (default: 42).")
+    parser.add_argument('--output', default='metadata_benchmark.jsonl', help="JSON lines file the results are appended to.")
+    parser.add_argument('--pg-bin', help="Directory containing initdb and pg_ctl.")
+    parser.add_argument('--keep', action='store_true', help="Keep the temporary cluster directory after the run.")
+    args = parser.parse_args()
+
+    commit, dirty = git_revision()
+    terms = load_terms(args.vocabularies)
+    logging.info(f"Loaded {len(terms)} vocabulary terms from {', '.join(args.vocabularies)}.")
+
+    workdir = tempfile.mkdtemp(prefix='metadata-bench-')
+    server = ThrowawayPostgres(find_pg_bin(args.pg_bin), workdir)
+    server.start()
+    try:
+        server_version = server.server_version()
+        config_file = os.path.join(workdir, 'config.ini')
+        write_config(config_file, server, 'bench_run', os.path.abspath(os.path.join(XML_DIR, args.vocabulary)), os.path.join(workdir, 'cache'))
+
+        with open(args.output, 'a', encoding='utf-8') as out:
+            for size in args.sizes:
+                rows = create_template(server, size, terms, args.seed)
+                for scenario in args.scenarios:
+                    script, extra_args = SCENARIOS[scenario]
+                    for run in range(args.repeat):
+                        fresh_database(server, 'bench_run')
+                        log_offset = server.log_size()
+                        elapsed, peak_rss_kib, exit_code = run_script(script, config_file, extra_args)
+                        result = {
+                            'timestamp': datetime.now(timezone.utc).isoformat(),
+                            'commit': commit,
+                            'dirty': dirty,
+                            'python': sys.version.split()[0],
+                            'postgres': server_version,
+                            'seed': args.seed,
+                            'size': size,
+                            'rows': rows,
+                            'scenario': scenario,
+                            'run': run,
+                            'exit_code': exit_code,
+                            # The scripts exit with status 1 when their run fails, so a failed run is
+                            # never mistaken for a fast one.
+                            'success': exit_code == 0,
+                            'wall_seconds': round(elapsed, 4),
+                            'queries': server.count_statements(log_offset),
+                            'rows_per_second': round(rows / elapsed, 1) if elapsed else None,
+                            'peak_rss_kib': peak_rss_kib,
+                        }
+                        out.write(json.dumps(result) + "\n")
+                        out.flush()
+                        if exit_code != 0:
+                            logging.warning(f"{scenario} size={size} run={run} failed with exit {exit_code}; its timings are not comparable.")
+                        logging.info(
+                            f"{scenario} size={size} run={run}: {elapsed:.2f}s, {result['queries']} queries, "
+                            f"{result['rows_per_second']} rows/s, {peak_rss_kib} KiB peak RSS, exit {exit_code}"
+                        )
+    finally:
+        server.stop()
+        if args.keep:
+            logging.info(f"Kept benchmark cluster in {workdir}.")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
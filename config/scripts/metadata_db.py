@@ -0,0 +1,169 @@
+## Shared database layer for the metadata maintenance scripts in `config/scripts/`.
+# Provides a single config loader, a per-process connection pool and prepared statements for the
+# hot queries, so `update_vocab.py`, `populate_subject_flat.py` and future scripts pay the
+# connection setup cost once per run.
+
+import configparser
+import logging
+import os
+from contextlib import contextmanager
+
+from psycopg2 import extensions, pool
+
+from run_metrics import MetricsCursor
+
+DEFAULT_CONFIG_PATH = '/data/dspace-angular-dspace-8.1/config/configs/config.ini'
+
+# Canonical section names, looked up case-insensitively (the example ini uses `[database]`).
+CANONICAL_SECTIONS = {'database': 'Database', 'paths': 'Paths'}
+
+# Prepared statements for the hot queries: name -> (parameter types, statement).
+PREPARED_STATEMENTS = {
+    'metadata_field_ids': ("", """
+        SELECT metadata_field_id, element, qualifier
+        FROM metadatafieldregistry
+        WHERE (element = 'subject' AND (qualifier IS NULL OR qualifier = 'flat'))
+           OR (element = 'title' AND qualifier IS NULL)
+    """),
+    'count_text_value': ("text", "SELECT COUNT(*) FROM metadatavalue WHERE text_value = $1"),
+    'text_value_exists': ("text", "SELECT EXISTS (SELECT 1 FROM metadatavalue WHERE text_value = $1)"),
+    'replace_text_value': ("text, text", "UPDATE metadatavalue SET text_value = $1 WHERE text_value = $2"),
+}
+
+
+def load_config(config_path=None):
+    """
+    Read the scripts' ini file and normalize its section names, e.g. `[database]` -> `[Database]`.
+    The example ini lists both `dbname` and `database`; whichever is filled in is used as `dbname`.
+    """
+    raw = configparser.ConfigParser()
+    read = raw.read(config_path or DEFAULT_CONFIG_PATH)
+    if not read:
+        logging.warning(f"Could not read configuration file {config_path or DEFAULT_CONFIG_PATH}.")
+
+    config = configparser.ConfigParser()
+    for section in raw.sections():
+        name = CANONICAL_SECTIONS.get(section.lower(), section)
+        if not config.has_section(name):
+            config.add_section(name)
+        for key, value in raw.items(section, raw=True):
+            config.set(name, key, value)
+
+    if config.has_section('Database') and not config['Database'].get('dbname'):
+        database = config['Database'].get('database')
+        if database:
+            config.set('Database', 'dbname', database)
+    return config
+
+
+def connection_kwargs(config):
+    database = config['Database']
+    return {
+        'dbname': database['dbname'],
+        'user': database['user'],
+        'password': database['password'],
+        'host': database['host'],
+        'port': database['port'],
+    }
+
+
+class MetadataConnection(extensions.connection):
+    """
+    Connection that remembers which statements have been prepared in its session.
+    Its cursors record query latencies in the active run_metrics.RunMetrics.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+        self.cursor_factory = MetricsCursor
+
+    def rollback(self):
+        # Re-check prepared statements after a rollback instead of assuming they survived it.
+        self.prepared.clear()
+        super().rollback()
+
+
+_pool = None
+_pool_pid = None
+
+
+def get_pool(config, maxconn=4):
+    """
+    Return this process's connection pool, creating it on first use.
+    Worker processes forked from a parent get their own pool instead of sharing its sockets.
+    """
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        _pool = pool.SimpleConnectionPool(
+            1, maxconn, connection_factory=MetadataConnection, **connection_kwargs(config)
+        )
+        _pool_pid = os.getpid()
+    return _pool
+
+
+def close_pool():
+    global _pool, _pool_pid
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.closeall()
+    _pool = None
+    _pool_pid = None
+
+
+@contextmanager
+def connection(config):
+    """
+    Borrow a pooled connection. Uncommitted work is rolled back when the connection is returned.
+    """
+    db_pool = get_pool(config)
+    conn = db_pool.getconn()
+    try:
+        yield conn
+    finally:
+        if not conn.closed and conn.status != extensions.STATUS_READY:
+            conn.rollback()
+        db_pool.putconn(conn)
+
+
+def execute_prepared(cursor, name, params=()):
+    """
+    Execute one of PREPARED_STATEMENTS, preparing it on the cursor's connection the first time.
+    """
+    conn = cursor.connection
+    prepared = getattr(conn, 'prepared', None)
+    if prepared is None or name not in prepared:
+        cursor.execute("SELECT 1 FROM pg_prepared_statements WHERE name = %s;", (name,))
+        if cursor.fetchone() is None:
+            types, statement = PREPARED_STATEMENTS[name]
+            cursor.execute(f"PREPARE {name}{f' ({types})' if types else ''} AS {statement};")
+        if prepared is not None:
+            prepared.add(name)
+
+    if params:
+        placeholders = ", ".join(["%s"] * len(params))
+        cursor.execute(f"EXECUTE {name} ({placeholders});", params)
+    else:
+        cursor.execute(f"EXECUTE {name};")
+
+
+def test_connection(config, sample_term=None):
+    """
+    Test the database connection and verify access to the metadatavalue table.
+    Optionally count the occurrences of sample_term to check the text_value search.
+    """
+    try:
+        with connection(config) as conn:
+            with conn.cursor() as cursor:
+                # Perform a simple query
+                cursor.execute("SELECT COUNT(*) FROM metadatavalue;")
+                result = cursor.fetchone()
+                logging.info(f"Successfully connected to the database. There are {result[0]} rows in the metadatavalue table.")
+
+                if sample_term is not None:
+                    execute_prepared(cursor, 'count_text_value', (sample_term,))
+                    result = cursor.fetchone()
+                    logging.info(f"Found {result[0]} occurrences of '{sample_term}' in the metadatavalue table.")
+        return True
+    except Exception as e:
+        logging.error(f"Failed to connect to the database or run test query: {str(e)}")
+        return False
@@ -0,0 +1,342 @@
+## Single-pass metadata maintenance pipeline.
+# Runs the rewrites of `update_vocab.py` and `populate_subject_flat.py` as stages over one scan of
+# `metadatavalue`, so the table is read once per maintenance run instead of once per script.
+# Rows are streamed per item through a server-side cursor, every stage sees (and can change) the
+# values left by the stages before it, and all changes are written in batches:
+# - `VocabPathStage` replaces bare vocabulary labels with their `A::B::C` paths. Unlike
+#   `update_vocab.py`, which rewrites matching values in every field, it only touches the fields
+#   given with `--vocab-field` (default `dc.subject`).
+# - `FlatSubjectStage` adds the last component of every dc.subject value to local.subject.flat
+#   when the item does not have it yet. It runs after the path rewrite, so new paths are picked up
+#   in the same run.
+# New stages subclass `Stage`, declare the field ids they read in `fields` and change the item
+# through `ItemRows.update()` / `ItemRows.insert()`.
+# The script can be run with the following options:
+# - `--config PATH` to read a different ini file than the default `config/configs/config.ini`.
+# - `--dry-run` to run every stage and report the changes, then roll them back.
+# - `--stages NAME,...` to choose the stages to run (default: vocab,flat).
+# - `--vocab-field FIELD` (repeatable) to choose the fields rewritten by the vocab stage.
+# - `--tree-numbers` / `--no-cache` as in `update_vocab.py`.
+# - `--fetch-size N` rows per round trip of the scan and `--batch-size N` changes per write batch.
+# - `--metrics-json PATH` / `--metrics-prom PATH` to write run metrics (see `run_metrics.py`).
+# - `--verbose` to log every change.
+
+import argparse
+import logging
+import sys
+from itertools import groupby
+from operator import itemgetter
+
+from psycopg2.extras import execute_values
+
+import metadata_db
+import run_metrics
+import vocab_cache
+from populate_subject_flat import extract_last_component
+from update_vocab import iter_paths
+
+class Row:
+    __slots__ = ('metadata_value_id', 'metadata_field_id', 'text_value')
+
+    def __init__(self, metadata_value_id, metadata_field_id, text_value):
+        self.metadata_value_id = metadata_value_id
+        self.metadata_field_id = metadata_field_id
+        self.text_value = text_value
+
+class ItemRows:
+    """
+    The scanned metadata values of one item, plus the changes the stages made to them.
+    """
+
+    def __init__(self, dspace_object_id, rows):
+        self.dspace_object_id = dspace_object_id
+        self.rows = rows
+        self.updated = {}
+        self.inserted = []
+
+    def values(self, field_id):
+        """
+        Return the current values of a field, including values changed or added by earlier stages.
+        """
+        return [row.text_value for row in self.rows if row.metadata_field_id == field_id]
+
+    def update(self, row, text_value):
+        row.text_value = text_value
+        if row.metadata_value_id is not None:
+            self.updated[row.metadata_value_id] = text_value
+
+    def insert(self, field_id, text_value):
+        row = Row(None, field_id, text_value)
+        self.rows.append(row)
+        self.inserted.append(row)
+
+class Stage:
+    """
+    Base class of the pipeline stages. `fields` holds the metadata_field_ids the stage reads.
+    """
+    name = None
+
+    def __init__(self):
+        self.fields = set()
+        self.changes = 0
+
+    def process(self, item):
+        raise NotImplementedError
+
+class VocabPathStage(Stage):
+    """
+    Replace values equal to a vocabulary label with the label's hierarchical path.
+    """
+    name = 'vocab'
+
+    def __init__(self, paths, field_ids):
+        super().__init__()
+        self.fields = set(field_ids)
+        # Same rules as the bulk mode of update_vocab.py: the first occurrence of a label wins and
+        # top-level labels, whose path is the label itself, are left alone.
+        self.paths = {}
+        for term, full_path in paths:
+            if term != full_path:
+                self.paths.setdefault(term, full_path)
+        logging.info(f"Loaded {len(self.paths)} vocabulary paths.")
+
+    def process(self, item):
+        for row in item.rows:
+            if row.metadata_field_id in self.fields:
+                full_path = self.paths.get(row.text_value)
+                if full_path is not None:
+                    logging.debug(f"Replacing '{row.text_value}' with '{full_path}' for dspace_object_id {item.dspace_object_id}.")
+                    item.update(row, full_path)
+                    self.changes += 1
+
+class FlatSubjectStage(Stage):
+    """
+    Add the last component of every dc.subject value to local.subject.flat if it is missing.
+    """
+    name = 'flat'
+
+    def __init__(self, dc_subject_id, local_subject_flat_id):
+        super().__init__()
+        self.dc_subject_id = dc_subject_id
+        self.local_subject_flat_id = local_subject_flat_id
+        self.fields = {dc_subject_id, local_subject_flat_id}
+
+    def process(self, item):
+        existing = set(item.values(self.local_subject_flat_id))
+        for full_path in item.values(self.dc_subject_id):
+            if full_path is None:
+                continue
+            term = extract_last_component(full_path)
+            if not term:
+                logging.warning(f"Empty last component for dspace_object_id {item.dspace_object_id}. Skipping.")
+                continue
+            if term not in existing:
+                logging.debug(f"Adding '{term}' to local.subject.flat for dspace_object_id {item.dspace_object_id}.")
+                item.insert(self.local_subject_flat_id, term)
+                existing.add(term)
+                self.changes += 1
+
+class BatchWriter:
+    """
+    Collect the changes of many items and write them with one multi-row UPDATE and INSERT per batch.
+    """
+
+    def __init__(self, cursor, batch_size=1000, dry_run=False):
+        self.cursor = cursor
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.updates = []
+        self.inserts = []
+        self.updated = 0
+        self.inserted = 0
+
+    def add(self, item):
+        self.updates.extend(item.updated.items())
+        self.inserts.extend((item.dspace_object_id, row.metadata_field_id, row.text_value) for row in item.inserted)
+        if len(self.updates) + len(self.inserts) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.dry_run:
+            if self.updates:
+                execute_values(
+                    self.cursor,
+                    """
+                    UPDATE metadatavalue m SET text_value = v.text_value
+                    FROM (VALUES %s) AS v (metadata_value_id, text_value)
+                    WHERE m.metadata_value_id = v.metadata_value_id;
+                    """,
+                    self.updates,
+                    page_size=self.batch_size
+                )
+            if self.inserts:
+                execute_values(
+                    self.cursor,
+                    "INSERT INTO metadatavalue (dspace_object_id, metadata_field_id, text_value) VALUES %s;",
+                    self.inserts,
+                    page_size=self.batch_size
+                )
+        self.updated += len(self.updates)
+        self.inserted += len(self.inserts)
+        self.updates = []
+        self.inserts = []
+
+def resolve_field(cursor, field):
+    """
+    Return the metadata_field_id of a field given as `schema.element[.qualifier]`, or None.
+    """
+    schema, element, *qualifier = field.split('.')
+    cursor.execute(
+        """
+        SELECT f.metadata_field_id
+        FROM metadatafieldregistry f
+        JOIN metadataschemaregistry s ON s.metadata_schema_id = f.metadata_schema_id
+        WHERE s.short_id = %s AND f.element = %s AND f.qualifier IS NOT DISTINCT FROM %s;
+        """,
+        (schema, element, qualifier[0] if qualifier else None)
+    )
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def iter_items(cursor, field_ids):
+    """
+    Yield an ItemRows for every item with values in the given fields, from a single ordered scan.
+    """
+    cursor.execute(
+        """
+        SELECT dspace_object_id, metadata_value_id, metadata_field_id, text_value
+        FROM metadatavalue
+        WHERE metadata_field_id = ANY(%s) AND dspace_object_id IS NOT NULL
+        ORDER BY dspace_object_id;
+        """,
+        (sorted(field_ids),)
+    )
+    rows = run_metrics.timed('db_fetch', cursor)
+    for dspace_object_id, item_rows in groupby(rows, key=itemgetter(0)):
+        yield ItemRows(dspace_object_id, [Row(*row[1:]) for row in item_rows])
+
+def build_stages(config, cursor, names, vocab_fields, tree_numbers=False, use_cache=True):
+    """
+    Create the requested stages in pipeline order. Returns None if a required field is missing.
+    """
+    stages = []
+    if 'vocab' in names:
+        field_ids = []
+        for field in vocab_fields:
+            field_id = resolve_field(cursor, field)
+            if field_id is None:
+                logging.error(f"Could not find metadata_field_id for {field}.")
+                return None
+            field_ids.append(field_id)
+
+        cache_dir = None
+        if use_cache:
+            cache_dir = config['Paths'].get('cache_dir', vocab_cache.DEFAULT_CACHE_DIR)
+        paths = iter_paths(config['Paths']['xml_file'], tree_numbers=tree_numbers, cache_dir=cache_dir)
+        stages.append(VocabPathStage(paths, field_ids))
+
+    if 'flat' in names:
+        dc_subject_id = resolve_field(cursor, 'dc.subject')
+        local_subject_flat_id = resolve_field(cursor, 'local.subject.flat')
+        if dc_subject_id is None or local_subject_flat_id is None:
+            logging.error("Could not find metadata_field_id for dc.subject or local.subject.flat.")
+            return None
+        stages.append(FlatSubjectStage(dc_subject_id, local_subject_flat_id))
+    return stages
+
+def run_pipeline(config, stage_names=('vocab', 'flat'), vocab_fields=('dc.subject',), tree_numbers=False, use_cache=True,
+                 dry_run=False, fetch_size=5000, batch_size=1000):
+    """
+    Run the stages over one scan of the fields they read and write their changes in batches.
+    Everything is applied in a single transaction. Returns True on success.
+    """
+    metrics = run_metrics.current or run_metrics.RunMetrics('metadata_pipeline').activate()
+    with metadata_db.connection(config) as conn:
+        try:
+            with conn.cursor() as cursor:
+                with metrics.phase('db_fetch'):
+                    stages = build_stages(config, cursor, stage_names, vocab_fields, tree_numbers=tree_numbers, use_cache=use_cache)
+                if not stages:
+                    return False
+
+                field_ids = set().union(*(stage.fields for stage in stages))
+                writer = BatchWriter(cursor, batch_size=batch_size, dry_run=dry_run)
+                scan_cursor = conn.cursor(name='metadata_pipeline_scan')
+                scan_cursor.itersize = fetch_size
+                items = 0
+                for item in iter_items(scan_cursor, field_ids):
+                    items += 1
+                    with metrics.phase('transform'):
+                        for stage in stages:
+                            stage.process(item)
+                    with metrics.phase('write'):
+                        writer.add(item)
+                    if items % 10000 == 0:
+                        logging.info(f"Processed {items} items so far.")
+                with metrics.phase('write'):
+                    writer.flush()
+                scan_cursor.close()
+
+            metrics.add_rows('items', items)
+            metrics.add_rows('rewritten', writer.updated)
+            metrics.add_rows('inserted', writer.inserted)
+            for stage in stages:
+                logging.info(f"Stage '{stage.name}': {stage.changes} changes.")
+
+            if dry_run:
+                conn.rollback()
+                logging.info(f"Dry Run: Would rewrite {writer.updated} and insert {writer.inserted} values for {items} items.")
+            else:
+                with metrics.phase('commit'):
+                    conn.commit()
+                logging.info(f"Rewrote {writer.updated} and inserted {writer.inserted} values for {items} items. All updates committed successfully.")
+            return True
+        except Exception as e:
+            logging.error(f"An error occurred: {str(e)}")
+            conn.rollback()
+            logging.info("Rolled back any changes due to the error.")
+            return False
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the metadata rewrites as stages over a single scan of metadatavalue.")
+    parser.add_argument('--config', default=metadata_db.DEFAULT_CONFIG_PATH, help="Path to the ini file with the database and XML settings.")
+    parser.add_argument('--dry-run', action='store_true', help="Run the stages and report the changes without committing them.")
+    parser.add_argument('--stages', default='vocab,flat', help="Comma-separated stages to run (default: vocab,flat). Stages always run in pipeline order.")
+    parser.add_argument('--vocab-field', action='append', dest='vocab_fields', help="Field rewritten by the vocab stage, e.g. dc.subject.mesh (repeatable; default: dc.subject).")
+    parser.add_argument('--tree-numbers', action='store_true', help="Build paths from dotted tree numbers in the node ids.")
+    parser.add_argument('--no-cache', action='store_true', help="Re-parse the XML instead of using the compiled vocabulary cache.")
+    parser.add_argument('--fetch-size', type=int, default=5000, help="Rows fetched per round trip of the scan (default: 5000).")
+    parser.add_argument('--batch-size', type=int, default=1000, help="Changes written per batch (default: 1000).")
+    parser.add_argument('--metrics-json', help="Write a JSON summary of run metrics to this file.")
+    parser.add_argument('--metrics-prom', help="Write run metrics to this Prometheus textfile-collector file.")
+    parser.add_argument('--verbose', action='store_true', help="Log every change.")
+    args = parser.parse_args()
+
+    if args.verbose:
+        logging.getLogger().setLevel(logging.DEBUG)
+
+    stage_names = [name.strip() for name in args.stages.split(',') if name.strip()]
+    unknown = set(stage_names) - {VocabPathStage.name, FlatSubjectStage.name}
+    if unknown:
+        parser.error(f"Unknown stage(s): {', '.join(sorted(unknown))}")
+
+    config = metadata_db.load_config(args.config)
+    metrics = run_metrics.RunMetrics('metadata_pipeline').activate()
+    try:
+        metrics.success = run_pipeline(
+            config,
+            stage_names=stage_names,
+            vocab_fields=args.vocab_fields or ['dc.subject'],
+            tree_numbers=args.tree_numbers,
+            use_cache=not args.no_cache,
+            dry_run=args.dry_run,
+            fetch_size=args.fetch_size,
+            batch_size=args.batch_size,
+        )
+    finally:
+        metadata_db.close_pool()
+        metrics.write(json_path=args.metrics_json, prometheus_path=args.metrics_prom)
+    return metrics.success
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -1,35 +1,16 @@
-import psycopg2
+from psycopg2.extras import execute_values
 import logging
-import configparser
 import argparse
+import json
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 
-def test_connection(config):
-    """
-    Test the database connection and verify access to the metadatavalue table.
-    """
-    try:
-        conn = psycopg2.connect(
-            dbname=config['Database']['dbname'],
-            user=config['Database']['user'],
-            password=config['Database']['password'],
-            host=config['Database']['host'],
-            port=config['Database']['port']
-        )
-        cursor = conn.cursor()
-        
-        # Perform a simple query
-        cursor.execute("SELECT COUNT(*) FROM metadatavalue;")
-        result = cursor.fetchone()
-        
-        logging.info(f"Successfully connected to the database. There are {result[0]} rows in the metadatavalue table.")
-        
-        cursor.close()
-        conn.close()
-        return True
-    except Exception as e:
-        logging.error(f"Failed to connect to the database or run test query: {str(e)}")
-        return False
+import metadata_db
+import run_metrics
+
+DEFAULT_CHECKPOINT_FILE = '/data/dspace/log/populate_subject_flat.checkpoint'
+DEFAULT_WATERMARK_FILE = '/data/dspace/log/populate_subject_flat.watermark.json'
 
 def extract_last_component(full_path):
     """
@@ -39,29 +20,297 @@ def extract_last_component(full_path):
         return full_path.split("::")[-1].strip()
     return full_path.strip()
 
-def process_metadata(config, dry_run=False):
+def fetch_titles(cursor, dspace_object_ids, dc_title_id):
     """
-    Process dc.subject metadata to populate local.subject.flat with the last component.
-    Also retrieves and prints the dc.title for each item.
+    Fetch the dc.title of many items with a single query.
+    Returns a dict of dspace_object_id -> title; items with several titles keep the first by place.
+    """
+    if not dspace_object_ids:
+        return {}
+    cursor.execute(
+        """
+        SELECT DISTINCT ON (dspace_object_id) dspace_object_id, text_value
+        FROM metadatavalue
+        WHERE metadata_field_id = %s AND dspace_object_id = ANY(%s::uuid[])
+        ORDER BY dspace_object_id, place;
+        """,
+        (dc_title_id, [str(dspace_object_id) for dspace_object_id in dspace_object_ids])
+    )
+    return dict(cursor.fetchall())
+
+def shard_filter(shard, column='dspace_object_id'):
+    """
+    Return an SQL condition that selects one hash partition of the items, or None for all items.
+    shard is a (shard_index, shard_count) tuple; both values are formatted as integers.
+    """
+    if shard is None:
+        return None
+    shard_index, shard_count = shard
+    return f"mod(abs(hashtext({column}::text)::bigint), {int(shard_count)}) = {int(shard_index)}"
+
+def watermark_filter(cursor, since, alias=''):
     """
+    Return an SQL condition that selects the dc.subject rows of items modified after the watermark
+    `since` (item.last_modified) or rows added after it (metadata_value_id), or None for all rows.
+    """
+    if since is None:
+        return None
+    return cursor.mogrify(
+        f"({alias}dspace_object_id IN (SELECT i.uuid FROM item i WHERE i.last_modified > %s::timestamptz)"
+        f" OR {alias}metadata_value_id > %s)",
+        (since['last_modified'], since['metadata_value_id'])
+    ).decode('utf-8')
+
+def item_conditions(cursor, shard=None, since=None, alias=''):
+    """
+    Combine the shard and watermark filters into an " AND ..." suffix for a WHERE clause.
+    """
+    conditions = [shard_filter(shard, column=f"{alias}dspace_object_id"), watermark_filter(cursor, since, alias=alias)]
+    return "".join(f" AND {condition}" for condition in conditions if condition)
+
+def capture_watermark(config):
+    """
+    Read the watermark to store after a successful run. It is taken before any rows are read, so
+    items modified while the run is in progress are picked up again by the next run.
+    """
+    with metadata_db.connection(config) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT now(), COALESCE(MAX(metadata_value_id), 0) FROM metadatavalue;")
+            last_modified, metadata_value_id = cursor.fetchone()
+    return {'last_modified': last_modified.isoformat(), 'metadata_value_id': metadata_value_id}
+
+def read_watermark(watermark_file):
     try:
-        conn = psycopg2.connect(
-            dbname=config['Database']['dbname'],
-            user=config['Database']['user'],
-            password=config['Database']['password'],
-            host=config['Database']['host'],
-            port=config['Database']['port']
+        with open(watermark_file, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def write_watermark(watermark_file, watermark):
+    tmp_file = f"{watermark_file}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(watermark, f)
+    os.replace(tmp_file, watermark_file)
+
+# Missing (item, term) pairs for local.subject.flat, computed entirely in PostgreSQL.
+# The regular expressions mirror extract_last_component: keep what follows the last '::' and trim whitespace.
+MISSING_FLAT_TERMS_SQL = """
+    WITH flat AS (
+        SELECT DISTINCT
+            s.dspace_object_id,
+            regexp_replace(regexp_replace(s.text_value, '^.*::', ''), '^\\s+|\\s+$', '', 'g') AS term
+        FROM metadatavalue s
+        WHERE s.metadata_field_id = %(dc_subject_id)s
+          AND s.text_value IS NOT NULL
+          {conditions}
+    )
+    SELECT f.dspace_object_id, %(local_subject_flat_id)s, f.term
+    FROM flat f
+    WHERE f.term <> ''
+      AND NOT EXISTS (
+          SELECT 1
+          FROM metadatavalue e
+          WHERE e.dspace_object_id = f.dspace_object_id
+            AND e.metadata_field_id = %(local_subject_flat_id)s
+            AND e.text_value = f.term
+      )
+"""
+
+def populate_server_side(cursor, dc_subject_id, local_subject_flat_id, dry_run=False, shard=None, since=None):
+    """
+    Insert every missing local.subject.flat value with a single INSERT ... SELECT ... WHERE NOT EXISTS.
+    Returns a tuple of (rows inserted, items affected). In dry run mode the rows are only counted.
+    """
+    params = {'dc_subject_id': dc_subject_id, 'local_subject_flat_id': local_subject_flat_id}
+    missing_sql = MISSING_FLAT_TERMS_SQL.format(conditions=item_conditions(cursor, shard=shard, since=since, alias='s.'))
+    if dry_run:
+        cursor.execute(
+            f"SELECT COUNT(*), COUNT(DISTINCT dspace_object_id) FROM ({missing_sql}) AS missing;",
+            params
+        )
+    else:
+        cursor.execute(
+            f"""
+            WITH inserted AS (
+                INSERT INTO metadatavalue (dspace_object_id, metadata_field_id, text_value)
+                {missing_sql}
+                RETURNING dspace_object_id
+            )
+            SELECT COUNT(*), COUNT(DISTINCT dspace_object_id) FROM inserted;
+            """,
+            params
+        )
+    return cursor.fetchone()
+
+def add_flat_term(updates, dspace_object_id, full_path):
+    """
+    Add the last component of a dc.subject value to the set of flat terms collected for an item.
+    """
+    last_component = extract_last_component(full_path)
+
+    if not last_component:
+        logging.warning(f"Empty last component for dspace_object_id {dspace_object_id}. Skipping.")
+        return
+
+    if dspace_object_id not in updates:
+        updates[dspace_object_id] = set()
+    updates[dspace_object_id].add(last_component)
+
+def iter_item_chunks(entries, chunk_size):
+    """
+    Group (dspace_object_id, text_value) rows ordered by dspace_object_id into dicts of at most
+    chunk_size items. All rows of an item are consecutive, so an item never spans two chunks.
+    """
+    updates = {}
+    for dspace_object_id, full_path in entries:
+        if dspace_object_id not in updates and len(updates) >= chunk_size:
+            yield updates
+            updates = {}
+        add_flat_term(updates, dspace_object_id, full_path)
+    if updates:
+        yield updates
+
+def iter_keyset_chunks(cursor, dc_subject_id, conditions, chunk_size, after=None):
+    """
+    Yield the dc.subject rows of the items after `after` in dicts of at most chunk_size items, one
+    keyset-paginated query per chunk. Every page is a separate statement, so the caller can commit
+    between chunks without a WITH HOLD cursor materialising the whole result at the first commit.
+    """
+    while True:
+        params = [dc_subject_id, dc_subject_id]
+        keyset = ""
+        if after is not None:
+            keyset = " AND dspace_object_id > %s::uuid"
+            params.append(str(after))
+        params.append(chunk_size)
+        cursor.execute(
+            f"""
+            SELECT dspace_object_id, text_value
+            FROM metadatavalue
+            WHERE metadata_field_id = %s{conditions} AND dspace_object_id IN (
+                SELECT DISTINCT dspace_object_id
+                FROM metadatavalue
+                WHERE metadata_field_id = %s{conditions}{keyset}
+                ORDER BY dspace_object_id
+                LIMIT %s
+            )
+            ORDER BY dspace_object_id;
+            """,
+            params
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            return
+        updates = {}
+        for dspace_object_id, full_path in rows:
+            add_flat_term(updates, dspace_object_id, full_path)
+        yield updates
+        after = rows[-1][0]
+
+def fetch_existing_flat_terms(cursor, dspace_object_ids, local_subject_flat_id):
+    """
+    Fetch the local.subject.flat values that already exist for many items with a single query.
+    Returns a set of (dspace_object_id, text_value) pairs.
+    """
+    if not dspace_object_ids:
+        return set()
+    cursor.execute(
+        "SELECT dspace_object_id, text_value FROM metadatavalue WHERE metadata_field_id = %s AND dspace_object_id = ANY(%s::uuid[]);",
+        (local_subject_flat_id, [str(dspace_object_id) for dspace_object_id in dspace_object_ids])
+    )
+    return set(cursor.fetchall())
+
+def apply_flat_terms(cursor, updates, local_subject_flat_id, titles, dry_run=False, print_titles=True, page_size=1000):
+    """
+    Insert the collected flat terms that do not exist yet in local.subject.flat.
+    Existing values are looked up for the whole batch at once and the new rows are written with
+    multi-row INSERTs. Returns the number of inserted (or, in dry run mode, insertable) values.
+    """
+    with run_metrics.current.phase('db_fetch'):
+        existing = fetch_existing_flat_terms(cursor, list(updates), local_subject_flat_id)
+    rows = []
+    for dspace_object_id, flat_terms in updates.items():
+        dc_title = titles.get(dspace_object_id, "No Title Found")
+
+        for term in flat_terms:
+            if not term:
+                logging.warning(f"Empty term for dspace_object_id {dspace_object_id}. Skipping insertion.")
+                continue
+
+            # Error Checking: Ensure term is indeed the last component
+            # This is redundant here since we extracted the last component, but added for extra safety
+            expected_term = extract_last_component(term)
+            if term != expected_term:
+                logging.error(f"Term mismatch for dspace_object_id {dspace_object_id}: '{term}' != '{expected_term}'. Skipping.")
+                continue
+
+            # Check if the term already exists in local.subject.flat for this item
+            if (dspace_object_id, term) in existing:
+                logging.debug(f"Term '{term}' already exists for dspace_object_id {dspace_object_id} in local.subject.flat.")
+                continue
+
+            # Print the title to stdout
+            if print_titles:
+                print(f"DSpace Object ID: {dspace_object_id}, Title: '{dc_title}'")
+
+            if dry_run:
+                logging.debug(f"Dry Run: Would insert term '{term}' for dspace_object_id {dspace_object_id} into local.subject.flat.")
+            else:
+                logging.debug(f"Inserting term '{term}' for dspace_object_id {dspace_object_id} into local.subject.flat.")
+            rows.append((dspace_object_id, local_subject_flat_id, term))
+
+    if rows and not dry_run:
+        # Insert the new local.subject.flat entries
+        execute_values(
+            cursor,
+            "INSERT INTO metadatavalue (dspace_object_id, metadata_field_id, text_value) VALUES %s;",
+            rows,
+            page_size=page_size
         )
+    return len(rows)
+
+def read_checkpoint(checkpoint_file):
+    """
+    Return the last dspace_object_id recorded in the checkpoint file, or None if there is none.
+    """
+    try:
+        with open(checkpoint_file, 'r') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def write_checkpoint(checkpoint_file, dspace_object_id):
+    """
+    Atomically record the last dspace_object_id whose chunk has been committed.
+    """
+    tmp_file = f"{checkpoint_file}.tmp"
+    with open(tmp_file, 'w') as f:
+        f.write(f"{dspace_object_id}\n")
+    os.replace(tmp_file, checkpoint_file)
+
+def process_metadata(config, dry_run=False, print_titles=True, server_side=False, stream=False, fetch_size=5000,
+                     chunk_size=500, chunked_commits=False, checkpoint_file=DEFAULT_CHECKPOINT_FILE, resume=False,
+                     shard=None, since=None):
+    """
+    Process dc.subject metadata to populate local.subject.flat with the last component.
+    Also retrieves and prints the dc.title for each item unless print_titles is False.
+    With chunked_commits, every chunk of the stream is committed on its own and the last committed
+    dspace_object_id is written to checkpoint_file so that a later run can resume from it.
+    With shard=(index, count), only the items in that hash partition are processed.
+    With a watermark in `since`, only items modified or given new dc.subject values after it are processed.
+    Timings, query counts and row counts are recorded in the active run_metrics.RunMetrics.
+    """
+    metrics = run_metrics.current or run_metrics.RunMetrics('populate_subject_flat').activate()
+    conn = None
+    cursor = None
+    try:
+        conn = metadata_db.get_pool(config).getconn()
         cursor = conn.cursor()
 
         # Retrieve metadata_field_id for dc.subject, local.subject.flat, and dc.title
-        cursor.execute("""
-            SELECT metadata_field_id, element, qualifier 
-            FROM metadatafieldregistry 
-            WHERE (element = 'subject' AND (qualifier IS NULL OR qualifier = 'flat'))
-               OR (element = 'title' AND qualifier IS NULL);
-        """)
-        fields = cursor.fetchall()
+        with metrics.phase('db_fetch'):
+            metadata_db.execute_prepared(cursor, 'metadata_field_ids')
+            fields = cursor.fetchall()
         dc_subject_id = None
         local_subject_flat_id = None
         dc_title_id = None
@@ -96,81 +345,101 @@ def process_metadata(config, dry_run=False):
         logging.info(f"local.subject.flat metadata_field_id: {local_subject_flat_id}")
         logging.info(f"dc.title metadata_field_id: {dc_title_id}")
 
-        # Fetch all metadatavalue entries for dc.subject
-        cursor.execute(
-            "SELECT dspace_object_id, text_value FROM metadatavalue WHERE metadata_field_id = %s;",
-            (dc_subject_id,)
-        )
-        dc_subject_entries = cursor.fetchall()
-        logging.info(f"Found {len(dc_subject_entries)} dc.subject entries to process.")
-
-        # Prepare to collect updates
-        updates = {}
-
-        for entry in dc_subject_entries:
-            dspace_object_id, full_path = entry
-            last_component = extract_last_component(full_path)
-
-            if not last_component:
-                logging.warning(f"Empty last component for dspace_object_id {dspace_object_id}. Skipping.")
-                continue
+        if server_side:
+            with metrics.phase('write'):
+                inserted, items = populate_server_side(cursor, dc_subject_id, local_subject_flat_id, dry_run=dry_run, shard=shard, since=since)
+            metrics.add_rows('items', items)
+            metrics.add_rows('inserted', inserted)
+            if dry_run:
+                logging.info(f"Dry Run: Would insert {inserted} local.subject.flat values for {items} items.")
+                logging.info("Dry run completed. No changes were made to the database.")
+            else:
+                with metrics.phase('commit'):
+                    conn.commit()
+                logging.info(f"Inserted {inserted} local.subject.flat values for {items} items. All updates committed successfully.")
+            return inserted
 
-            if dspace_object_id not in updates:
-                updates[dspace_object_id] = set()
-            updates[dspace_object_id].add(last_component)
+        conditions = item_conditions(cursor, shard=shard, since=since)
 
-        logging.info(f"Prepared {len(updates)} unique items for local.subject.flat updates.")
+        inserted = 0
+        if stream:
+            # Stream dc.subject rows ordered by item and apply them chunk by chunk, so memory is bounded
+            # by the chunk size rather than the repository. Without commits a named (server-side)
+            # cursor streams the rows; with chunked commits every chunk is fetched with its own keyset
+            # query after the last committed item, which is also what --resume starts from.
+            last_id = None
+            if resume:
+                last_id = read_checkpoint(checkpoint_file)
+                if last_id:
+                    logging.info(f"Resuming after dspace_object_id {last_id} from {checkpoint_file}.")
+                else:
+                    logging.info(f"No checkpoint found at {checkpoint_file}. Starting from the beginning.")
 
-        # Iterate over updates and apply them
-        for dspace_object_id, flat_terms in updates.items():
-            # Fetch dc.title for the current dspace_object_id
-            cursor.execute(
-                "SELECT text_value FROM metadatavalue WHERE dspace_object_id = %s AND metadata_field_id = %s;",
-                (dspace_object_id, dc_title_id)
-            )
-            title_result = cursor.fetchone()
-            dc_title = title_result[0] if title_result else "No Title Found"
-
-            for term in flat_terms:
-                if not term:
-                    logging.warning(f"Empty term for dspace_object_id {dspace_object_id}. Skipping insertion.")
-                    continue
-
-                # Error Checking: Ensure term is indeed the last component
-                # This is redundant here since we extracted the last component, but added for extra safety
-                expected_term = extract_last_component(term)
-                if term != expected_term:
-                    logging.error(f"Term mismatch for dspace_object_id {dspace_object_id}: '{term}' != '{expected_term}'. Skipping.")
-                    continue
-
-                # Check if the term already exists in local.subject.flat for this item
+            stream_cursor = None
+            if chunked_commits and not dry_run:
+                chunks = iter_keyset_chunks(cursor, dc_subject_id, conditions, chunk_size, after=last_id)
+            else:
+                query = "SELECT dspace_object_id, text_value FROM metadatavalue WHERE metadata_field_id = %s" + conditions
+                params = [dc_subject_id]
+                if last_id:
+                    query += " AND dspace_object_id > %s::uuid"
+                    params.append(last_id)
+                stream_cursor = conn.cursor(name='dc_subject_stream')
+                stream_cursor.itersize = fetch_size
+                with metrics.phase('db_fetch'):
+                    stream_cursor.execute(query + " ORDER BY dspace_object_id;", params)
+                chunks = iter_item_chunks(stream_cursor, chunk_size)
+            items = 0
+            for updates in metrics.timed_iter('db_fetch', chunks):
+                items += len(updates)
+                with metrics.phase('db_fetch'):
+                    titles = fetch_titles(cursor, list(updates), dc_title_id) if print_titles else {}
+                with metrics.phase('write'):
+                    inserted += apply_flat_terms(cursor, updates, local_subject_flat_id, titles, dry_run=dry_run, print_titles=print_titles)
+                if chunked_commits and not dry_run:
+                    with metrics.phase('commit'):
+                        conn.commit()
+                    write_checkpoint(checkpoint_file, next(reversed(updates)))
+                logging.info(f"Processed {items} items so far ({inserted} values inserted).")
+            if stream_cursor is not None:
+                stream_cursor.close()
+            metrics.add_rows('items', items)
+            if chunked_commits and not dry_run and os.path.exists(checkpoint_file):
+                os.remove(checkpoint_file)
+        else:
+            # Fetch all metadatavalue entries for dc.subject
+            with metrics.phase('db_fetch'):
                 cursor.execute(
-                    "SELECT 1 FROM metadatavalue WHERE dspace_object_id = %s AND metadata_field_id = %s AND text_value = %s;",
-                    (dspace_object_id, local_subject_flat_id, term)
+                    f"SELECT dspace_object_id, text_value FROM metadatavalue WHERE metadata_field_id = %s{conditions};",
+                    (dc_subject_id,)
                 )
-                exists = cursor.fetchone()
-                if exists:
-                    logging.debug(f"Term '{term}' already exists for dspace_object_id {dspace_object_id} in local.subject.flat.")
-                    continue
+                dc_subject_entries = cursor.fetchall()
+            metrics.add_rows('subject_rows', len(dc_subject_entries))
+            logging.info(f"Found {len(dc_subject_entries)} dc.subject entries to process.")
 
-                # Print the title to stdout
-                print(f"DSpace Object ID: {dspace_object_id}, Title: '{dc_title}'")
+            # Prepare to collect updates
+            updates = {}
+            for dspace_object_id, full_path in dc_subject_entries:
+                add_flat_term(updates, dspace_object_id, full_path)
 
-                if dry_run:
-                    logging.info(f"Dry Run: Would insert term '{term}' for dspace_object_id {dspace_object_id} into local.subject.flat.")
-                else:
-                    # Insert the new local.subject.flat entry
-                    cursor.execute(
-                        "INSERT INTO metadatavalue (dspace_object_id, metadata_field_id, text_value) VALUES (%s, %s, %s);",
-                        (dspace_object_id, local_subject_flat_id, term)
-                    )
-                    logging.info(f"Inserted term '{term}' for dspace_object_id {dspace_object_id} into local.subject.flat.")
+            logging.info(f"Prepared {len(updates)} unique items for local.subject.flat updates.")
+            metrics.add_rows('items', len(updates))
+
+            # Fetch the dc.title of every item in one query instead of one query per item
+            with metrics.phase('db_fetch'):
+                titles = fetch_titles(cursor, list(updates), dc_title_id) if print_titles else {}
+
+            with metrics.phase('write'):
+                inserted = apply_flat_terms(cursor, updates, local_subject_flat_id, titles, dry_run=dry_run, print_titles=print_titles)
 
+        metrics.add_rows('inserted', inserted)
         if not dry_run:
-            conn.commit()
-            logging.info("All updates committed successfully.")
+            with metrics.phase('commit'):
+                conn.commit()
+            logging.info(f"All updates committed successfully. Inserted {inserted} local.subject.flat values.")
         else:
             logging.info("Dry run completed. No changes were made to the database.")
+        return inserted
 
     except Exception as e:
         logging.error(f"An error occurred: {str(e)}")
@@ -178,44 +447,152 @@ def process_metadata(config, dry_run=False):
             conn.rollback()
             logging.info("Rolled back any changes due to the error.")
     finally:
-        if 'cursor' in locals():
+        if cursor:
             cursor.close()
-        if 'conn' in locals() and not conn.closed:
-            conn.close()
+        if conn:
+            metadata_db.get_pool(config).putconn(conn)
+
+def run_shard(config, shard, options):
+    """
+    Worker entry point: process one hash partition of the items on the worker's own connection.
+    Returns the inserted count and the worker's metrics summary.
+    """
+    metrics = run_metrics.RunMetrics(f"populate_subject_flat.worker{shard[0]}").activate()
+    try:
+        return process_metadata(config, shard=shard, **options), metrics.summary()
+    finally:
+        metadata_db.close_pool()
+
+def run_workers(config, workers, options):
+    """
+    Process the items in `workers` hash partitions in parallel and merge their inserted counts.
+    Each partition keeps its own checkpoint file so that --resume works per partition.
+    Returns the total inserted count, or None if any partition failed.
+    """
+    worker_config = {'Database': dict(config['Database'])}
+    # Close the parent's connections (e.g. from capture_watermark) before forking. A child that
+    # inherited them would close their shared sockets when it replaces the pool, ending the
+    # parent's sessions.
+    metadata_db.close_pool()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for shard_index in range(workers):
+            shard_options = dict(options, checkpoint_file=f"{options['checkpoint_file']}.{shard_index}-of-{workers}")
+            futures.append(executor.submit(run_shard, worker_config, (shard_index, workers), shard_options))
+        results = []
+        for shard_index, future in enumerate(futures):
+            try:
+                inserted, summary = future.result()
+            except Exception as e:
+                logging.error(f"Worker {shard_index} failed: {str(e)}")
+                results.append(None)
+                continue
+            run_metrics.current.merge(summary)
+            results.append(inserted)
+
+    failed = [shard_index for shard_index, result in enumerate(results) if result is None]
+    inserted = sum(result for result in results if result is not None)
+    logging.info(f"{workers} workers processed local.subject.flat: {inserted} values {'to insert' if options['dry_run'] else 'inserted'}.")
+    if failed:
+        logging.error(f"Workers {failed} failed. Their partitions were rolled back to their last commit.")
+        return None
+    return inserted
 
 def main():
     parser = argparse.ArgumentParser(description="Populate local.subject.flat based on dc.subject and print dc.title.")
+    parser.add_argument('--config', default=metadata_db.DEFAULT_CONFIG_PATH, help="Path to the ini file with the database settings.")
     parser.add_argument('--dry-run', action='store_true', help="Simulate the changes without committing them to the database.")
     parser.add_argument('--test-connection', action='store_true', help="Test the database connection.")
     parser.add_argument('--stdout', action='store_true', help="Write logs to stdout instead of a log file.")
+    parser.add_argument('--no-titles', action='store_true', help="Skip fetching and printing dc.title for updated items.")
+    parser.add_argument('--server-side', action='store_true', help="Insert all missing values with one INSERT ... SELECT in PostgreSQL.")
+    parser.add_argument('--stream', action='store_true', help="Stream dc.subject rows through a server-side cursor and apply them in chunks.")
+    parser.add_argument('--fetch-size', type=int, default=5000, help="Rows fetched per round trip in --stream mode (default: 5000).")
+    parser.add_argument('--chunk-size', type=int, default=500, help="Items applied per chunk in --stream mode (default: 500).")
+    parser.add_argument('--chunked-commits', action='store_true', help="Commit after every chunk and record a checkpoint (implies --stream).")
+    parser.add_argument('--checkpoint-file', default=DEFAULT_CHECKPOINT_FILE, help=f"Checkpoint file for --chunked-commits (default: {DEFAULT_CHECKPOINT_FILE}).")
+    parser.add_argument('--resume', action='store_true', help="Continue after the dspace_object_id recorded in the checkpoint file (implies --chunked-commits).")
+    parser.add_argument('--incremental', action='store_true', help="Only process items modified or given new dc.subject values since the last successful incremental run.")
+    parser.add_argument('--watermark-file', default=DEFAULT_WATERMARK_FILE, help=f"High-water mark file for --incremental (default: {DEFAULT_WATERMARK_FILE}).")
+    parser.add_argument('--workers', type=int, default=1, help="Process items in N hash partitions in parallel worker processes (default: 1).")
+    parser.add_argument('--metrics-json', help="Write a JSON summary of run metrics to this file.")
+    parser.add_argument('--metrics-prom', help="Write run metrics to this Prometheus textfile-collector file.")
+    parser.add_argument('--verbose', action='store_true', help="Log every inserted term (DEBUG level).")
     args = parser.parse_args()
 
-    # Set up logging
+    # Set up logging. Worker processes share the handler, so tag their lines with the process name.
+    log_format = '%(asctime)s - %(processName)s - %(levelname)s - %(message)s' if args.workers > 1 else '%(asctime)s - %(levelname)s - %(message)s'
+    log_level = logging.DEBUG if args.verbose else logging.INFO
     if args.stdout:
         logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
+            level=log_level,
+            format=log_format,
             stream=sys.stdout
         )
     else:
         logging.basicConfig(
             filename='/data/dspace/log/populate_subject_flat.log',
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s'
+            level=log_level,
+            format=log_format
         )
 
     # Load configuration
-    config = configparser.ConfigParser()
-    config.read('/data/dspace-angular-dspace-8.1/config/configs/config.ini')
+    config = metadata_db.load_config(args.config)
 
     if args.test_connection:
-        if test_connection(config):
+        if metadata_db.test_connection(config):
             logging.info("Connection test successful.")
+            return True
+        logging.error("Connection test failed.")
+        return False
+
+    options = dict(
+        dry_run=args.dry_run,
+        print_titles=not args.no_titles,
+        server_side=args.server_side,
+        stream=args.stream or args.chunked_commits or args.resume,
+        fetch_size=args.fetch_size,
+        chunk_size=args.chunk_size,
+        chunked_commits=args.chunked_commits or args.resume,
+        checkpoint_file=args.checkpoint_file,
+        resume=args.resume
+    )
+    metrics = run_metrics.RunMetrics('populate_subject_flat').activate()
+    try:
+        if args.incremental:
+            # The watermark of a chunked run is kept next to its checkpoint until the run completes.
+            # A resumed run reuses it: items committed before the interruption may have changed
+            # since, and only a watermark from before they were processed picks them up next time.
+            pending_watermark_file = f"{args.checkpoint_file}.watermark.json"
+            chunked = options['chunked_commits'] and not args.dry_run
+            new_watermark = read_watermark(pending_watermark_file) if args.resume else None
+            if new_watermark:
+                logging.info(f"Resuming with the watermark {new_watermark['last_modified']} of the interrupted run from {pending_watermark_file}.")
+            else:
+                new_watermark = capture_watermark(config)
+                if chunked:
+                    write_watermark(pending_watermark_file, new_watermark)
+            options['since'] = read_watermark(args.watermark_file)
+            if options['since']:
+                logging.info(f"Incremental run: processing changes since {options['since']['last_modified']} (metadata_value_id > {options['since']['metadata_value_id']}).")
+            else:
+                logging.info(f"No watermark found at {args.watermark_file}. Processing all items.")
+
+        if args.workers > 1:
+            result = run_workers(config, args.workers, options)
         else:
-            logging.error("Connection test failed.")
-        return
+            result = process_metadata(config, **options)
+        metrics.success = result is not None
 
-    process_metadata(config, dry_run=args.dry_run)
+        if args.incremental and metrics.success and not args.dry_run:
+            write_watermark(args.watermark_file, new_watermark)
+            logging.info(f"Stored new watermark {new_watermark['last_modified']} in {args.watermark_file}.")
+            if os.path.exists(pending_watermark_file):
+                os.remove(pending_watermark_file)
+    finally:
+        metadata_db.close_pool()
+        metrics.write(json_path=args.metrics_json, prometheus_path=args.metrics_prom)
+    return metrics.success
 
 if __name__ == "__main__":
-    main()
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,187 @@
+## Run metrics for the metadata maintenance scripts in `config/scripts/`.
+# Records per-phase timings, query counts with a latency histogram and affected row counts, and writes
+# them as a JSON summary and/or a Prometheus textfile-collector file (node_exporter
+# `--collector.textfile.directory`).
+#
+# Phases can nest: time spent in an inner phase (e.g. lazily parsing XML while rows are written) is
+# only counted towards the inner phase, so the phase timings add up to the instrumented run time.
+
+import json
+import os
+import time
+from contextlib import contextmanager
+
+from psycopg2 import extensions
+
+# Upper bounds of the query latency histogram buckets, in seconds.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+# Metrics of the running script; queries executed through MetricsCursor are recorded here.
+current = None
+
+
+class RunMetrics:
+    def __init__(self, script):
+        self.script = script
+        self.started = time.time()
+        self.phases = {}
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.rows = {}
+        self.success = None
+        self._stack = []
+
+    def activate(self):
+        global current
+        current = self
+        return self
+
+    @contextmanager
+    def phase(self, name):
+        frame = [time.perf_counter(), 0.0]
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            elapsed = time.perf_counter() - frame[0]
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed - frame[1]
+            if self._stack:
+                self._stack[-1][1] += elapsed
+
+    def timed_iter(self, name, iterable):
+        """
+        Wrap an iterator so that the time spent producing each item is counted towards `name`.
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.phase(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def record_query(self, seconds):
+        self.queries += 1
+        self.query_seconds += seconds
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[index] += 1
+                break
+
+    def add_rows(self, kind, count):
+        self.rows[kind] = self.rows.get(kind, 0) + (count or 0)
+
+    def merge(self, summary):
+        """
+        Add the summary of another run (e.g. a worker process) to this one.
+        """
+        for name, seconds in summary['phases'].items():
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+        self.queries += summary['queries']['count']
+        self.query_seconds += summary['queries']['seconds']
+        for index, count in enumerate(summary['queries']['buckets'].values()):
+            self.buckets[index] += count
+        for kind, count in summary['rows'].items():
+            self.add_rows(kind, count)
+
+    def summary(self):
+        return {
+            'script': self.script,
+            'started': self.started,
+            'duration_seconds': time.time() - self.started,
+            'success': self.success,
+            'phases': self.phases,
+            'queries': {
+                'count': self.queries,
+                'seconds': self.query_seconds,
+                # Non-cumulative counts per upper bound; queries slower than the last bound are only in 'count'.
+                'buckets': {str(bound): count for bound, count in zip(LATENCY_BUCKETS, self.buckets)},
+            },
+            'rows': self.rows,
+        }
+
+    def write_json(self, path):
+        _write_atomic(path, json.dumps(self.summary(), indent=2) + "\n")
+
+    def write_prometheus(self, path):
+        labels = f'script="{self.script}"'
+        lines = [
+            "# HELP pedspace_metadata_phase_seconds Time spent in each phase of the last run.",
+            "# TYPE pedspace_metadata_phase_seconds gauge",
+        ]
+        for name, seconds in self.phases.items():
+            lines.append(f'pedspace_metadata_phase_seconds{{{labels},phase="{name}"}} {seconds:.6f}')
+        lines += [
+            "# HELP pedspace_metadata_query_duration_seconds Latency of the queries issued by the last run.",
+            "# TYPE pedspace_metadata_query_duration_seconds histogram",
+        ]
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+            cumulative += count
+            lines.append(f'pedspace_metadata_query_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines += [
+            f'pedspace_metadata_query_duration_seconds_bucket{{{labels},le="+Inf"}} {self.queries}',
+            f'pedspace_metadata_query_duration_seconds_sum{{{labels}}} {self.query_seconds:.6f}',
+            f'pedspace_metadata_query_duration_seconds_count{{{labels}}} {self.queries}',
+            "# HELP pedspace_metadata_rows Rows affected by the last run.",
+            "# TYPE pedspace_metadata_rows gauge",
+        ]
+        for kind, count in self.rows.items():
+            lines.append(f'pedspace_metadata_rows{{{labels},kind="{kind}"}} {count}')
+        lines += [
+            "# HELP pedspace_metadata_last_run_success Whether the last run completed successfully.",
+            "# TYPE pedspace_metadata_last_run_success gauge",
+            f'pedspace_metadata_last_run_success{{{labels}}} {1 if self.success else 0}',
+            "# HELP pedspace_metadata_last_run_timestamp_seconds Start time of the last run.",
+            "# TYPE pedspace_metadata_last_run_timestamp_seconds gauge",
+            f'pedspace_metadata_last_run_timestamp_seconds{{{labels}}} {self.started:.0f}',
+        ]
+        _write_atomic(path, "\n".join(lines) + "\n")
+
+    def write(self, json_path=None, prometheus_path=None):
+        if json_path:
+            self.write_json(json_path)
+        if prometheus_path:
+            self.write_prometheus(prometheus_path)
+
+
+def timed(name, iterable):
+    """
+    Count the time spent producing the items of `iterable` towards phase `name` of the active run.
+    """
+    if current is None:
+        return iterable
+    return current.timed_iter(name, iterable)
+
+
+def _write_atomic(path, content):
+    # The textfile collector may read at any time, so never expose a half-written file.
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+class MetricsCursor(extensions.cursor):
+    """
+    Cursor that records the latency of every execute() in the active RunMetrics.
+    """
+
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            if current is not None:
+                current.record_query(time.perf_counter() - start)
+
+    def executemany(self, query, vars_list):
+        start = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            if current is not None:
+                current.record_query(time.perf_counter() - start)
@@ -1,19 +1,52 @@
 ## This is a script I generated that traverses the vocabulary XML file and updates the database with 
 # the hierarchical paths of the vocabulary terms.
 # Configure the file at `config.ini` with the database connection details and the path to the XML file.
+# Connections, config loading and prepared statements come from the shared `metadata_db` module.
 # The script can be run with the following options:
+# - `--config PATH` to read a different ini file than the default `config/configs/config.ini`.
 # - `--dry-run` to simulate the changes without committing them to the database.
 # - `--test-connection` to test the database connection.
+# - `--bulk` to stage every (term, path) pair in a temporary table and rewrite all matching rows
+#   with a single join-based UPDATE instead of one SELECT + UPDATE per term.
+# - `--tree-numbers` to build the paths from dotted tree numbers in the node ids (e.g. the flat MeSH
+#   vocabulary) instead of from the nesting of the XML.
+# - `--no-cache` to ignore the compiled vocabulary cache. By default the extracted paths are cached in
+#   `[Paths] cache_dir` (default `/data/dspace/log/vocab-cache`, kept private to the running user),
+#   keyed on the XML content hash and PARSER_VERSION.
+# - `--incremental` to only apply the nodes that were added, renamed or moved since the last successful
+#   run. The applied vocabulary is snapshotted to `[Paths] snapshot_file` after every commit. The delta
+#   is always applied with the single bulk UPDATE in one transaction (see incremental_paths).
+# - `--plan` to report, without changing anything, how many rows each term would rewrite, which terms
+#   match no rows and the estimated cost of the bulk UPDATE from EXPLAIN. Works with `--incremental`.
+# - `--label-policy POLICY` to choose how labels that occur under several parents are resolved:
+#   `first` (default) or `last` occurrence, `skip` them, or `authority` to rewrite each value to the
+#   path of the node named by its authority key (implies `--bulk`). Every distinct label is written
+#   once. `--collision-report PATH` writes the ambiguous labels and their paths as JSON.
+# - `--workers N` to split the terms into N shards by term hash and apply them in parallel, one
+#   database connection and transaction per worker.
+# - `--metrics-json PATH` / `--metrics-prom PATH` to write per-phase timings, query counts and latencies
+#   and affected rows as a JSON summary and/or a Prometheus textfile-collector file.
+# - `--verbose` to log every term. Per-term messages are logged at DEBUG level and hidden by default.
 # You can choose which term you will use to test the connection by changing the `sample_term` variable.
 
 global sample_term
 sample_term = "Data Anomaly Method"
 
 import xml.etree.ElementTree as ET
-import psycopg2
 import logging
-from psycopg2 import sql
-import configparser
+from psycopg2 import extensions
+from psycopg2.extras import execute_values
+import json
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import metadata_db
+import run_metrics
+import vocab_cache
+from vocab_index import LabelCollisionIndex, TreeNumberIndex
+
+# Bump whenever the extraction logic changes so that compiled vocabulary caches are rebuilt.
+PARSER_VERSION = 1
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -36,110 +69,488 @@ def extract_paths(node, current_path="", is_root=True):
     
     return paths
 
-def test_connection(config):
+def iter_vocab_nodes(xml_file):
+    # Stream the vocabulary with iterparse instead of loading the whole tree. Yields
+    # (node_id, label, full_path) in the same pre-order as extract_paths, skipping the root node.
+    # Every element is cleared and detached from its parent once it has been fully read, so memory
+    # only grows with the depth of the vocabulary, not its size.
+    labels = []
+    elements = []
+    for event, elem in ET.iterparse(xml_file, events=("start", "end")):
+        if event == "start":
+            if elem.tag == "node":
+                label = elem.get("label")
+                if labels:
+                    yield elem.get("id"), label, "::".join([*labels[1:], label])
+                labels.append(label)
+            elements.append(elem)
+        else:
+            elements.pop()
+            if elem.tag == "node":
+                labels.pop()
+            elem.clear()
+            if elements:
+                elements[-1].remove(elem)
+
+def iter_tree_number_nodes(xml_file):
+    # Rebuild the hierarchy of a flat vocabulary from the dotted tree numbers in the node ids.
+    def tree_numbers():
+        for node_id, label, _full_path in iter_vocab_nodes(xml_file):
+            if node_id:
+                yield node_id, label
+            else:
+                logging.warning(f"Node '{label}' has no tree number. Skipping.")
+
+    index = TreeNumberIndex.from_nodes(run_metrics.timed('xml_parse', tree_numbers()))
+    logging.info(f"Indexed {len(index)} tree numbers for {len(index.tree_numbers)} terms.")
+    yield from index.iter_paths()
+
+def load_vocab_nodes(xml_file, tree_numbers=False, cache_dir=None):
+    # Return the (node_id, label, full_path) records for a vocabulary, served from the compiled
+    # cache when the XML has not changed since it was built. Pass cache_dir=None to bypass it.
+    def build():
+        if tree_numbers:
+            return run_metrics.timed('path_extraction', iter_tree_number_nodes(xml_file))
+        return run_metrics.timed('xml_parse', iter_vocab_nodes(xml_file))
+
+    if cache_dir is None:
+        return build()
+
+    mode = "tree-numbers" if tree_numbers else "nested"
+    cache_file = os.path.join(cache_dir, f"{os.path.basename(xml_file)}.{mode}.vcache")
+    key = vocab_cache.content_key(xml_file, PARSER_VERSION, mode)
+    return run_metrics.timed('cache_read', vocab_cache.cached_records(cache_file, key, build))
+
+def iter_paths(xml_file, tree_numbers=False, cache_dir=None):
+    for _node_id, label, full_path in load_vocab_nodes(xml_file, tree_numbers=tree_numbers, cache_dir=cache_dir):
+        yield label, full_path
+
+def node_key(node_id, full_path):
+    # Nodes are tracked by id so that renames and moves can be detected; fall back to the path
+    # for vocabularies without ids.
+    return node_id or f"path:{full_path}"
+
+def load_snapshot(snapshot_file):
     try:
-        conn = psycopg2.connect(
-            dbname=config['Database']['dbname'],
-            user=config['Database']['user'],
-            password=config['Database']['password'],
-            host=config['Database']['host'],
-            port=config['Database']['port']
-        )
-        cursor = conn.cursor()
-        
-        # Perform a simple query
-        cursor.execute("SELECT COUNT(*) FROM metadatavalue;")
-        result = cursor.fetchone()
-        
-        logging.info(f"Successfully connected to the database. There are {result[0]} rows in the metadatavalue table.")
-        
-        # Test the search query with a parent node term
-        
-        cursor.execute("SELECT COUNT(*) FROM metadatavalue WHERE text_value = %s;", (sample_term,))
-        result = cursor.fetchone()
-        
-        logging.info(f"Found {result[0]} occurrences of '{sample_term}' in the metadatavalue table.")
-        
-        cursor.close()
-        conn.close()
-        return True
-    except Exception as e:
-        logging.error(f"Failed to connect to the database or run test query: {str(e)}")
-        return False
+        with open(snapshot_file, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except FileNotFoundError:
+        return None
+    return {key: tuple(value) for key, value in snapshot['nodes'].items()}
+
+def save_snapshot(snapshot_file, xml_file, nodes):
+    os.makedirs(os.path.dirname(snapshot_file) or ".", exist_ok=True)
+    tmp_file = f"{snapshot_file}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump({'xml_file': xml_file, 'parser_version': PARSER_VERSION, 'nodes': nodes}, f, ensure_ascii=False)
+    os.replace(tmp_file, snapshot_file)
+    logging.info(f"Saved snapshot of {len(nodes)} applied vocabulary nodes to {snapshot_file}.")
+
+def diff_vocabulary(previous, current):
+    # Compare two {key: (label, full_path)} snapshots. A node whose label changed is "renamed";
+    # a node that kept its label but whose path changed (including every descendant of a renamed
+    # or moved node) is "moved".
+    delta = {'added': [], 'removed': [], 'renamed': [], 'moved': []}
+    for key, (label, full_path) in current.items():
+        if key not in previous:
+            delta['added'].append((key, label, full_path))
+            continue
+        old_label, old_path = previous[key]
+        if old_label != label:
+            delta['renamed'].append((key, old_path, full_path))
+        elif old_path != full_path:
+            delta['moved'].append((key, old_path, full_path))
+    for key, (label, full_path) in previous.items():
+        if key not in current:
+            delta['removed'].append((key, label, full_path))
+    return delta
+
+def incremental_paths(delta):
+    # Turn a vocabulary delta into (current text_value, new text_value) pairs. Rows of changed nodes
+    # already hold the previously applied path; rows of new nodes still hold the bare label.
+    # Removed nodes are only reported: their rows are left untouched.
+    # The pairs can chain (A -> B, B -> C) or form cycles, so they must be applied with the single
+    # BULK_UPDATE_SQL join, which matches every row against its value before the update. Separate
+    # UPDATEs, per term or per worker shard, would move the rows of A on to C.
+    for _key, old_path, full_path in delta['renamed'] + delta['moved']:
+        yield old_path, full_path
+    for _key, label, full_path in delta['added']:
+        yield label, full_path
 
 def update_psql_table(term, full_path, cursor, dry_run=False):
     try:
-        search_query = sql.SQL("SELECT * FROM metadatavalue WHERE text_value = %s;")
-        update_query = sql.SQL("UPDATE metadatavalue SET text_value = %s WHERE text_value = %s;")
-
         if dry_run:
-            logging.info(f"Dry Run: Simulating search for '{term}'. Would replace with: '{full_path}'")
+            logging.debug(f"Dry Run: Simulating search for '{term}'. Would replace with: '{full_path}'")
         else:
-            cursor.execute(search_query, (term,))
-            results = cursor.fetchall()
+            metadata_db.execute_prepared(cursor, 'text_value_exists', (term,))
+            found = cursor.fetchone()[0]
 
-            if results:
-                logging.info(f"Found '{term}' in text_value. Replacing with '{full_path}'.")
-                cursor.execute(update_query, (full_path, term))
+            if found:
+                logging.debug(f"Found '{term}' in text_value. Replacing with '{full_path}'.")
+                metadata_db.execute_prepared(cursor, 'replace_text_value', (full_path, term))
+                return cursor.rowcount
             else:
-                logging.info(f"Term '{term}' not found in database.")
+                logging.debug(f"Term '{term}' not found in database.")
     except Exception as e:
+        # The transaction is aborted now, so every later statement would fail too. Let the caller
+        # roll back and keep the snapshot untouched so that the next run retries the delta.
         logging.error(f"Error processing term '{term}': {str(e)}")
+        raise
+    return 0
+
+# A label can occur more than once in the vocabulary. The per-term mode rewrites the rows on
+# the first occurrence and finds nothing afterwards, so the staged modes keep the first occurrence as well.
+# Terms whose path equals the label (top-level nodes) would be a no-op rewrite and are skipped.
+# Rewrites staged with an authority (see LabelCollisionIndex) only apply to values whose authority
+# key, e.g. `dc_subject_mesh:D02.092`, ends in that node id.
+STAGED_TERMS_SQL = """
+    SELECT DISTINCT ON (term, authority) term, full_path, authority
+    FROM vocab_staging
+    ORDER BY term, authority, position
+"""
+
+AUTHORITY_MATCH_SQL = "(t.authority IS NULL OR regexp_replace(m.authority, '^.*:', '') = t.authority)"
+
+BULK_UPDATE_SQL = f"""
+    WITH terms AS ({STAGED_TERMS_SQL}), updated AS (
+        UPDATE metadatavalue m
+        SET text_value = t.full_path
+        FROM terms t
+        WHERE m.text_value = t.term
+          AND t.term <> t.full_path
+          AND {AUTHORITY_MATCH_SQL}
+        RETURNING t.term
+    )
+    SELECT term, COUNT(*) FROM updated GROUP BY term
+"""
+
+def stage_paths(paths, cursor):
+    # Load all (term, full_path) pairs, or (term, full_path, authority) rewrites, into a temporary
+    # staging table in one round trip. Returns the number of staged pairs.
+    cursor.execute("""
+        CREATE TEMPORARY TABLE vocab_staging (
+            position integer NOT NULL,
+            term text NOT NULL,
+            full_path text NOT NULL,
+            authority text
+        ) ON COMMIT DROP;
+    """)
+    execute_values(
+        cursor,
+        "INSERT INTO vocab_staging (position, term, full_path, authority) VALUES %s;",
+        (
+            (position, term, full_path, authority[0] if authority else None)
+            for position, (term, full_path, *authority) in enumerate(paths)
+        ),
+        page_size=1000
+    )
+    cursor.execute("SELECT COUNT(*) FROM vocab_staging;")
+    staged = cursor.fetchone()[0]
+    logging.info(f"Staged {staged} vocabulary terms.")
+    return staged
+
+def bulk_update_psql_table(paths, cursor, dry_run=False):
+    # Stage all (term, full_path) pairs and rewrite every matching row with a single
+    # UPDATE ... FROM join. Returns {term: rows_updated}.
+    if dry_run:
+        for term, full_path, *_authority in paths:
+            logging.debug(f"Dry Run: Would stage '{term}' for bulk replacement with: '{full_path}'")
+        return {}
+
+    staged = stage_paths(paths, cursor)
+    cursor.execute(BULK_UPDATE_SQL)
+    counts = dict(cursor.fetchall())
+
+    for term, count in sorted(counts.items()):
+        logging.debug(f"Replaced {count} occurrence(s) of '{term}'.")
+    logging.info(f"Bulk update rewrote {sum(counts.values())} rows for {len(counts)} of {staged} staged terms.")
+    return counts
+
+def plan_paths(paths, cursor, top=20):
+    # Read-only impact estimate: stage the terms, count the rows each one would rewrite with one
+    # aggregate query and ask the planner for the cost of the bulk UPDATE. The caller rolls back.
+    # Returns a summary dict.
+    metrics = run_metrics.current
+    with metrics.phase('write'):
+        staged = stage_paths(paths, cursor)
+    with metrics.phase('db_fetch'):
+        cursor.execute(f"""
+            SELECT t.term, COUNT(m.metadata_value_id)
+            FROM ({STAGED_TERMS_SQL}) t
+            LEFT JOIN metadatavalue m ON m.text_value = t.term AND {AUTHORITY_MATCH_SQL}
+            WHERE t.term <> t.full_path
+            GROUP BY t.term;
+        """)
+        counts = dict(cursor.fetchall())
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {BULK_UPDATE_SQL};")
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    root = plan[0]['Plan']
+    nodes = [root]
+    update_node = root
+    while nodes:
+        node = nodes.pop()
+        if node['Node Type'] == 'ModifyTable':
+            update_node = node
+            break
+        nodes.extend(node.get('Plans', []))
+
+    matched = {term: count for term, count in counts.items() if count}
+    summary = {
+        'staged': staged,
+        'terms': len(counts),
+        'matched_terms': len(matched),
+        'unmatched_terms': len(counts) - len(matched),
+        'rows': sum(matched.values()),
+        'estimated_cost': root['Total Cost'],
+        'estimated_rows': update_node['Plan Rows'],
+    }
+    metrics.add_rows('planned', summary['rows'])
+
+    for term, count in sorted(matched.items(), key=lambda item: (-item[1], item[0]))[:top]:
+        logging.info(f"Plan: '{term}' would rewrite {count} rows.")
+    for term in sorted(set(counts) - set(matched)):
+        logging.debug(f"Plan: '{term}' matches no rows.")
+    logging.info(
+        f"Plan: {summary['rows']} rows would be rewritten for {summary['matched_terms']} of {summary['terms']} terms; "
+        f"{summary['unmatched_terms']} terms match no rows."
+    )
+    logging.info(f"Plan: estimated UPDATE cost {summary['estimated_cost']} for {summary['estimated_rows']} rows (EXPLAIN).")
+    return summary
+
+def resolve_collisions(nodes, policy='first', report_file=None):
+    # Yield one rewrite per distinct label, resolving labels that occur under several parents with
+    # `policy`. The default `first` policy streams: a label is yielded as soon as it is first seen,
+    # so rows are staged or updated while the XML is still being parsed. The other policies need
+    # every occurrence of a label and index the whole vocabulary first. Ambiguous labels are logged
+    # and, if report_file is set, written to it as JSON once the vocabulary has been read.
+    if policy == 'first':
+        index = LabelCollisionIndex()
+        yield from index.stream_first(nodes)
+    else:
+        index = LabelCollisionIndex.from_nodes(nodes)
+        yield from index.resolve(policy)
+
+    with run_metrics.current.phase('path_extraction'):
+        collisions = index.collisions()
+    logging.info(f"Indexed {len(index)} distinct labels; {len(collisions)} occur under more than one path (policy: {policy}).")
+    for label, paths in collisions.items():
+        logging.debug(f"Ambiguous label '{label}': {' | '.join(paths)}")
+    if report_file:
+        with open(report_file, 'w', encoding='utf-8') as f:
+            json.dump({'policy': policy, 'collisions': collisions}, f, ensure_ascii=False, indent=2)
+        logging.info(f"Wrote {len(collisions)} ambiguous labels to {report_file}.")
+
+def apply_paths(paths, cursor, bulk=False, dry_run=False):
+    # Apply (term, full_path) pairs and record the processed terms and rewritten rows in the run metrics.
+    metrics = run_metrics.current
+    terms = 0
+    rewritten = 0
+
+    def counted(paths):
+        nonlocal terms
+        for pair in paths:
+            terms += 1
+            yield pair
+
+    with metrics.phase('write'):
+        if bulk:
+            rewritten = sum(bulk_update_psql_table(counted(paths), cursor, dry_run=dry_run).values())
+        else:
+            for term, full_path, *_authority in counted(paths):
+                rewritten += update_psql_table(term, full_path, cursor, dry_run=dry_run)
+
+    metrics.add_rows('terms', terms)
+    metrics.add_rows('rewritten', rewritten)
+    if dry_run:
+        logging.info(f"Dry Run: Processed {terms} terms. Use --verbose to list them.")
+    else:
+        logging.info(f"Processed {terms} terms and rewrote {rewritten} rows.")
+
+def shard_of(term, workers):
+    # zlib.crc32 is stable across processes, unlike the randomised built-in hash(). All occurrences of
+    # a label land in the same shard. Rows matched by different labels only never overlap because a
+    # full run rewrites bare labels to paths; incremental deltas can chain and are never sharded.
+    return zlib.crc32(term.encode('utf-8')) % workers
+
+def apply_shard(config, paths, bulk, shard):
+    # Worker entry point: apply one shard of terms on its own connection and transaction.
+    # Returns the worker's metrics summary so the parent can merge it.
+    metrics = run_metrics.RunMetrics(f"update_vocab.worker{shard}").activate()
+    try:
+        with metadata_db.connection(config) as conn:
+            with conn.cursor() as cursor:
+                apply_paths(paths, cursor, bulk=bulk)
+            if conn.info.transaction_status == extensions.TRANSACTION_STATUS_INERROR:
+                raise RuntimeError(f"Worker {shard}: the transaction was aborted by an earlier error.")
+            with metrics.phase('commit'):
+                conn.commit()
+        logging.info(f"Worker {shard}: committed {len(paths)} terms.")
+        return metrics.summary()
+    finally:
+        metadata_db.close_pool()
+
+def run_workers(config, paths, workers, bulk=False):
+    # Split the terms into shards and apply them in a process pool. Each shard commits on its own,
+    # so a failed shard leaves the others applied; rerunning is safe because applied rows no longer
+    # match their label. Returns True if every shard succeeded.
+    shards = [[] for _ in range(workers)]
+    for rewrite in paths:
+        shards[shard_of(rewrite[0], workers)].append(rewrite)
+
+    worker_config = {'Database': dict(config['Database'])}
+    succeeded = True
+    total_terms = 0
+    total_rows = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(apply_shard, worker_config, shard_paths, bulk, shard): shard
+            for shard, shard_paths in enumerate(shards)
+        }
+        for future in as_completed(futures):
+            shard = futures[future]
+            try:
+                summary = future.result()
+            except Exception as e:
+                logging.error(f"Worker {shard} failed: {str(e)}")
+                succeeded = False
+                continue
+            run_metrics.current.merge(summary)
+            total_terms += summary['rows'].get('terms', 0)
+            total_rows += summary['rows'].get('rewritten', 0)
 
-def main(dry_run=False, test_conn=False):
-    config = configparser.ConfigParser()
-    config.read('/data/dspace-angular-dspace-8.1/config/configs/config.ini')
+    logging.info(f"{workers} workers applied {total_terms} terms and rewrote {total_rows} rows.")
+    return succeeded
+
+def main(config_path=None, dry_run=False, test_conn=False, bulk=False, tree_numbers=False, use_cache=True, incremental=False, workers=1,
+         metrics_json=None, metrics_prom=None, plan=False, label_policy='first', collision_report=None):
+    config = metadata_db.load_config(config_path)
+    metrics = run_metrics.RunMetrics('update_vocab').activate()
 
     if test_conn:
-        if test_connection(config):
+        if metadata_db.test_connection(config, sample_term=sample_term):
             logging.info("Connection test successful.")
-        else:
-            logging.error("Connection test failed.")
-        return
+            return True
+        logging.error("Connection test failed.")
+        return False
 
     conn = None
     cursor = None
 
+    if label_policy == 'authority' and not bulk:
+        logging.info("The authority label policy matches rows by their authority key and requires --bulk. Enabling it.")
+        bulk = True
+    if incremental:
+        if not bulk:
+            logging.info("Incremental deltas can chain renames and are applied with a single bulk UPDATE. Enabling --bulk.")
+            bulk = True
+        if workers > 1:
+            logging.info("Incremental deltas are applied in a single transaction. Ignoring --workers.")
+            workers = 1
+
     try:
-        if not dry_run:
-            conn = psycopg2.connect(
-                dbname=config['Database']['dbname'],
-                user=config['Database']['user'],
-                password=config['Database']['password'],
-                host=config['Database']['host'],
-                port=config['Database']['port']
-            )
+        parallel = workers > 1 and not dry_run and not plan
+        if (not dry_run and not parallel) or plan:
+            conn = metadata_db.get_pool(config).getconn()
             cursor = conn.cursor()
 
-        tree = ET.parse(config['Paths']['xml_file'])
-        root = tree.getroot()
+        cache_dir = None
+        if use_cache:
+            cache_dir = config['Paths'].get('cache_dir', vocab_cache.DEFAULT_CACHE_DIR)
+
+        xml_file = config['Paths']['xml_file']
+        current = None
+        if incremental:
+            snapshot_file = config['Paths'].get(
+                'snapshot_file',
+                f"/data/dspace/log/update_vocab.{os.path.basename(xml_file)}.snapshot.json"
+            )
+            current = {}
+            for node_id, label, full_path in load_vocab_nodes(xml_file, tree_numbers=tree_numbers, cache_dir=cache_dir):
+                current.setdefault(node_key(node_id, full_path), (label, full_path))
+
+            with metrics.phase('path_extraction'):
+                previous = load_snapshot(snapshot_file)
+                if previous is None:
+                    logging.info(f"No snapshot found at {snapshot_file}. Applying the full vocabulary.")
+                    previous = {}
+                delta = diff_vocabulary(previous, current)
+            logging.info(
+                f"Vocabulary delta: {len(delta['added'])} added, {len(delta['removed'])} removed, "
+                f"{len(delta['renamed'])} renamed, {len(delta['moved'])} moved."
+            )
+            for _key, label, full_path in delta['removed']:
+                logging.warning(f"Node '{full_path}' was removed from the vocabulary. Existing values are left unchanged.")
+            paths = incremental_paths(delta)
+        else:
+            nodes = load_vocab_nodes(xml_file, tree_numbers=tree_numbers, cache_dir=cache_dir)
+            paths = resolve_collisions(nodes, policy=label_policy, report_file=collision_report)
 
-        paths = extract_paths(root, is_root=True)
+        if plan:
+            plan_paths(paths, cursor)
+            conn.rollback()
+            metrics.success = True
+            return True
 
-        for term, full_path in paths:
-            update_psql_table(term, full_path, cursor, dry_run=dry_run)
+        if parallel:
+            metrics.success = run_workers(config, paths, workers, bulk=bulk)
+            if metrics.success:
+                logging.info("All worker updates committed successfully.")
+                if incremental:
+                    save_snapshot(snapshot_file, xml_file, current)
+            else:
+                logging.error("Some workers failed. Their shards were rolled back; rerun to apply them.")
+            return metrics.success
+
+        apply_paths(paths, cursor, bulk=bulk, dry_run=dry_run)
 
         if not dry_run and conn:
-            conn.commit()
+            # commit() on a failed transaction rolls back without raising.
+            if conn.info.transaction_status == extensions.TRANSACTION_STATUS_INERROR:
+                raise RuntimeError("The transaction was aborted by an earlier error.")
+            with metrics.phase('commit'):
+                conn.commit()
             logging.info("All updates committed successfully.")
+            if incremental:
+                save_snapshot(snapshot_file, xml_file, current)
+        metrics.success = True
 
     except Exception as e:
+        metrics.success = False
         logging.error(f"An error occurred: {str(e)}")
         if conn:
             conn.rollback()
     finally:
         if cursor:
             cursor.close()
-        if conn:
-            conn.close()
+        metadata_db.close_pool()
+        metrics.write(json_path=metrics_json, prometheus_path=metrics_prom)
+    return metrics.success
 
 if __name__ == "__main__":
     import argparse
+    import sys
     
     parser = argparse.ArgumentParser(description="Update vocabulary in the database.")
+    parser.add_argument('--config', default=metadata_db.DEFAULT_CONFIG_PATH, help="Path to the ini file with the database and XML settings.")
     parser.add_argument('--dry-run', action='store_true', help="Perform a dry run without making changes.")
     parser.add_argument('--test-connection', action='store_true', help="Test the database connection.")
+    parser.add_argument('--bulk', action='store_true', help="Apply all terms with a single staged, join-based UPDATE.")
+    parser.add_argument('--tree-numbers', action='store_true', help="Build paths from dotted tree numbers in the node ids.")
+    parser.add_argument('--no-cache', action='store_true', help="Re-parse the XML instead of using the compiled vocabulary cache.")
+    parser.add_argument('--incremental', action='store_true', help="Only apply nodes added, renamed or moved since the last run.")
+    parser.add_argument('--plan', action='store_true', help="Report how many rows each term would rewrite and the estimated cost, without changing anything.")
+    parser.add_argument('--label-policy', choices=LabelCollisionIndex.POLICIES, default='first', help="How to resolve labels that occur under several parents (default: first).")
+    parser.add_argument('--collision-report', help="Write the labels that occur under several parents to this JSON file.")
+    parser.add_argument('--workers', type=int, default=1, help="Apply term shards in N parallel worker processes (default: 1).")
+    parser.add_argument('--metrics-json', help="Write a JSON summary of run metrics to this file.")
+    parser.add_argument('--metrics-prom', help="Write run metrics to this Prometheus textfile-collector file.")
+    parser.add_argument('--verbose', action='store_true', help="Log every processed term.")
     
     args = parser.parse_args()
+    if args.verbose:
+        logging.getLogger().setLevel(logging.DEBUG)
     
-    main(dry_run=args.dry_run, test_conn=args.test_connection)
\ No newline at end of file
+    succeeded = main(config_path=args.config, dry_run=args.dry_run, test_conn=args.test_connection, bulk=args.bulk, tree_numbers=args.tree_numbers, use_cache=not args.no_cache, incremental=args.incremental, workers=args.workers, metrics_json=args.metrics_json, metrics_prom=args.metrics_prom, plan=args.plan, label_policy=args.label_policy, collision_report=args.collision_report)
+    sys.exit(0 if succeeded else 1)
@@ -0,0 +1,140 @@
+## On-disk cache of compiled vocabularies for `update_vocab.py`.
+# A cache file holds the (node_id, label, full_path) records extracted from one vocabulary XML file.
+# It is keyed on a SHA-256 digest of the XML content plus a parser version, so it is rebuilt
+# automatically whenever the vocabulary or the extraction logic changes.
+#
+# Layout (all integers little-endian):
+#   header:  magic b"PVOC" | format version (uint16) | reserved (uint16) | key (32 bytes) | record count (uint32)
+#   records: three length-prefixed UTF-8 strings per record (uint32 length, 0xFFFFFFFF for None)
+# The file is read through mmap, so records are decoded lazily without loading the whole file.
+#
+# Cached paths are written into `metadatavalue` as they are, so the cache directory must be private:
+# it is created with mode 0700, and a directory owned by another user is never read or written.
+
+import hashlib
+import logging
+import mmap
+import os
+import stat
+import struct
+import tempfile
+
+MAGIC = b"PVOC"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sHH32sI")
+_LENGTH = struct.Struct("<I")
+_NONE = 0xFFFFFFFF
+
+# Default cache directory, next to the scripts' logs and snapshots rather than in the shared /tmp.
+DEFAULT_CACHE_DIR = '/data/dspace/log/vocab-cache'
+
+
+def content_key(path, *salt):
+    """
+    Return the SHA-256 digest of a file's content combined with any extra salt values.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    for value in salt:
+        digest.update(b"\0" + str(value).encode('utf-8'))
+    return digest.digest()
+
+
+def read_cache(cache_file, key):
+    """
+    Return an iterator over the cached records, or None if the cache is missing or stale.
+    """
+    try:
+        with open(cache_file, 'rb') as f:
+            header = f.read(_HEADER.size)
+    except FileNotFoundError:
+        return None
+
+    if len(header) < _HEADER.size:
+        return None
+    magic, version, _reserved, cached_key, count = _HEADER.unpack(header)
+    if magic != MAGIC or version != FORMAT_VERSION or cached_key != key:
+        return None
+    return _iter_records(cache_file, count)
+
+
+def _iter_records(cache_file, count):
+    with open(cache_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        offset = _HEADER.size
+        for _ in range(count):
+            record = []
+            for _field in range(3):
+                (length,) = _LENGTH.unpack_from(data, offset)
+                offset += _LENGTH.size
+                if length == _NONE:
+                    record.append(None)
+                else:
+                    record.append(data[offset:offset + length].decode('utf-8'))
+                    offset += length
+            yield tuple(record)
+
+
+def _pack(value):
+    if value is None:
+        return _LENGTH.pack(_NONE)
+    encoded = value.encode('utf-8')
+    return _LENGTH.pack(len(encoded)) + encoded
+
+
+def write_through(cache_file, key, records):
+    """
+    Yield `records` unchanged while writing them to `cache_file`.
+    The cache is only put in place once the iterator has been fully consumed, so an interrupted
+    run never leaves a truncated cache behind.
+    """
+    directory = os.path.dirname(cache_file) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".vcache-")
+    count = 0
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, 0, key, 0))
+            for record in records:
+                f.write(b"".join(_pack(value) for value in record))
+                count += 1
+                yield record
+            f.seek(0)
+            f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, 0, key, count))
+        os.replace(tmp_path, cache_file)
+        logging.info(f"Wrote {count} vocabulary records to cache {cache_file}.")
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+
+def private_dir(directory):
+    """
+    Create `directory` with mode 0700 if needed and return whether it is safe to cache in: owned by
+    the current user and not accessible to anyone else. A directory we own is tightened to 0700.
+    """
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+        return False
+    if stat.S_IMODE(info.st_mode) & 0o077:
+        os.chmod(directory, 0o700)
+    return True
+
+
+def cached_records(cache_file, key, build):
+    """
+    Return the records stored under `key`, calling `build()` to produce and cache them on a miss.
+    The cache is bypassed if its directory is not private to the current user.
+    """
+    directory = os.path.dirname(cache_file) or "."
+    if not private_dir(directory):
+        logging.warning(f"Vocabulary cache directory {directory} is not owned by the current user. Not using the cache.")
+        return build()
+    records = read_cache(cache_file, key)
+    if records is not None:
+        logging.info(f"Using cached vocabulary {cache_file}.")
+        return records
+    logging.info(f"Vocabulary cache {cache_file} is missing or stale. Rebuilding.")
+    return write_through(cache_file, key, build())
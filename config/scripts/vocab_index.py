@@ -0,0 +1,171 @@
+## Indexes over the controlled vocabulary XML files in `config/xmls/`.
+# `dc_subject_mesh.xml` is stored as a flat list of nodes and only encodes its hierarchy in the
+# dotted MeSH tree numbers kept in the `id` attribute (e.g. `D02.092.877.674.033`).
+# `TreeNumberIndex` rebuilds the `Parent::Child` paths from those ids so that `update_vocab.py`
+# and other vocabulary tooling can treat flat and nested vocabularies the same way.
+
+from collections import defaultdict
+
+
+class _TrieNode:
+    __slots__ = ("children", "label")
+
+    def __init__(self):
+        self.children = {}
+        self.label = None
+
+
+class TreeNumberIndex:
+    """
+    Prefix trie keyed on the dot-separated components of tree numbers.
+    A term that appears under several tree numbers is added once per tree number and gets one
+    path per position in the hierarchy. Tree numbers whose ancestors are missing from the
+    vocabulary are attached to the nearest ancestor that is present.
+    """
+
+    def __init__(self, separator="."):
+        self.separator = separator
+        self.root = _TrieNode()
+        self.tree_numbers = defaultdict(list)
+
+    @classmethod
+    def from_nodes(cls, nodes, separator="."):
+        """
+        Build an index from an iterable of (tree_number, label) pairs.
+        """
+        index = cls(separator=separator)
+        for tree_number, label in nodes:
+            index.add(tree_number, label)
+        return index
+
+    def add(self, tree_number, label):
+        node = self.root
+        for part in tree_number.split(self.separator):
+            child = node.children.get(part)
+            if child is None:
+                child = node.children[part] = _TrieNode()
+            node = child
+        if node.label is None:
+            node.label = label
+            self.tree_numbers[label].append(tree_number)
+        elif node.label != label:
+            raise ValueError(f"Tree number '{tree_number}' is assigned to both '{node.label}' and '{label}'.")
+
+    def __len__(self):
+        return sum(len(numbers) for numbers in self.tree_numbers.values())
+
+    def iter_paths(self):
+        """
+        Yield (tree_number, label, full_path) for every indexed tree number, parents before
+        children. Each trie node is visited once, so the walk is linear in the vocabulary size.
+        """
+        stack = [(self.root, (), None)]
+        while stack:
+            node, parts, parent_path = stack.pop()
+            if node.label is not None:
+                full_path = f"{parent_path}::{node.label}" if parent_path else node.label
+                yield self.separator.join(parts), node.label, full_path
+            else:
+                full_path = parent_path
+            # Push in reverse so children come out in insertion order.
+            for part, child in reversed(node.children.items()):
+                stack.append((child, parts + (part,), full_path))
+
+    def path(self, tree_number):
+        """
+        Return the full `Parent::Child` path for a single tree number, or None if it is unknown.
+        """
+        labels = []
+        node = self.root
+        for part in tree_number.split(self.separator):
+            node = node.children.get(part)
+            if node is None:
+                return None
+            if node.label is not None:
+                labels.append(node.label)
+        return "::".join(labels) if node.label is not None else None
+
+    def paths_for(self, label):
+        """
+        Return every path under which `label` appears, one per tree number.
+        """
+        return [self.path(tree_number) for tree_number in self.tree_numbers.get(label, [])]
+
+
+class LabelCollisionIndex:
+    """
+    Groups the occurrences of every label in a vocabulary so that a label found under several
+    parents is resolved to a single rewrite instead of one full-table UPDATE per occurrence.
+
+    Resolution policies for labels with more than one distinct path:
+    - `first` / `last`: use the path of the first / last occurrence in vocabulary order.
+    - `skip`: leave the label's values untouched.
+    - `authority`: rewrite each value to the path of the node whose id matches the value's
+      authority key; values without a matching authority are left untouched.
+    """
+
+    POLICIES = ("first", "last", "skip", "authority")
+
+    def __init__(self):
+        self.occurrences = {}
+
+    @classmethod
+    def from_nodes(cls, nodes):
+        """
+        Build an index from an iterable of (node_id, label, full_path) records.
+        """
+        index = cls()
+        for node_id, label, full_path in nodes:
+            index.add(node_id, label, full_path)
+        return index
+
+    def add(self, node_id, label, full_path):
+        self.occurrences.setdefault(label, []).append((node_id, full_path))
+
+    def stream_first(self, nodes):
+        """
+        Yield the `first` policy's (label, full_path, None) rewrites while reading `nodes`, each as
+        soon as its label is first seen. Only the distinct paths of every label are indexed, so
+        collisions() is complete once the generator is exhausted.
+        """
+        for node_id, label, full_path in nodes:
+            occurrences = self.occurrences.get(label)
+            if occurrences is None:
+                self.occurrences[label] = [(node_id, full_path)]
+                yield label, full_path, None
+            elif all(path != full_path for _node_id, path in occurrences):
+                occurrences.append((node_id, full_path))
+
+    def __len__(self):
+        return len(self.occurrences)
+
+    def collisions(self):
+        """
+        Return {label: [full_path, ...]} for every label that occurs under more than one path.
+        """
+        collisions = {}
+        for label, occurrences in self.occurrences.items():
+            paths = list(dict.fromkeys(full_path for _node_id, full_path in occurrences))
+            if len(paths) > 1:
+                collisions[label] = paths
+        return collisions
+
+    def resolve(self, policy="first"):
+        """
+        Yield (label, full_path, authority) rewrites, one per label and, for the `authority`
+        policy, one per node of an ambiguous label. `authority` is the node id the value's
+        authority key must match, or None if every value of the label is rewritten.
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown label collision policy '{policy}'.")
+        for label, occurrences in self.occurrences.items():
+            if len({full_path for _node_id, full_path in occurrences}) == 1:
+                yield label, occurrences[0][1], None
+            elif policy == "first":
+                yield label, occurrences[0][1], None
+            elif policy == "last":
+                yield label, occurrences[-1][1], None
+            elif policy == "authority":
+                for node_id, full_path in occurrences:
+                    if node_id:
+                        yield label, full_path, node_id
@@ -3,51 +3,17 @@
 import json
 import argparse
 import sys
-import re
 from typing import Dict, Tuple, List, Any
 
+from json5_cache import load_catalog
+from json5_writer import sync_catalog
+
 def parse_json5(filepath: str) -> Dict[str, str]:
     """
-    Parse a JSON5 file into a dictionary.
-    Handles the specific format with keys and values on separate lines.
-    Preserves Angular template syntax and HTML tags.
+    Parse a JSON5 file into a dictionary with decoded values.
+    A key that occurs more than once maps to the list of its values in file order.
     """
-    result = {}
-    
-    with open(filepath, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Remove comments
-    content = re.sub(r'//.*?\n', '\n', content)
-    
-    # Parse key-value pairs with a more careful approach
-    # This pattern looks for "key": "value" pairs but carefully handles escaped quotes
-    lines = content.split('\n')
-    current_key = None
-    current_value = None
-    
-    for line in lines:
-        # Skip empty lines and lines that are just brackets or whitespace
-        line = line.strip()
-        if not line or line in ['{', '}']:
-            continue
-            
-        # Look for key-value pairs
-        key_match = re.match(r'"([^"]+)":\s*"(.*)"(?:,)?$', line)
-        if key_match:
-            key = key_match.group(1)
-            value = key_match.group(2)
-            
-            if key in result:
-                # Mark as duplicate by storing both values
-                if isinstance(result[key], list):
-                    result[key].append(value)
-                else:
-                    result[key] = [result[key], value]
-            else:
-                result[key] = value
-    
-    return result
+    return load_catalog(filepath)
 
 def find_duplicates(data: Dict[str, Any]) -> Dict[str, List[str]]:
     """
@@ -95,50 +61,127 @@ def resolve_duplicates(data: Dict[str, Any]) -> Dict[str, str]:
     
     return resolved_data
 
-def write_json5(data: Dict[str, str], output_file: str) -> None:
+POLICIES = ('first', 'last', 'longest')
+
+def choose_value(values: List[str], rule: Any, reference: Any = None) -> Tuple[int, str]:
     """
-    Write the resolved data back to a JSON5 file in the same format.
-    Properly preserves Angular template syntax and HTML tags.
+    Pick one of a duplicate key's values according to a rule.
+    A rule is 'first', 'last', 'longest', 'locale:<file>' (the value equal to `reference`, the key's
+    value in that catalog) or a 1-based option number. Returns (index, reason).
     """
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write("{\n\n")
-        for key, value in sorted(data.items()):
-            # Escape any quotes within the value - only needed if they're not already escaped
-            escaped_value = value.replace('"', '\\"') if not value.find('\\"') >= 0 else value
-            # Replace back any double-escaped quotes to avoid over-escaping
-            escaped_value = escaped_value.replace('\\\\"', '\\"')
-            
-            f.write(f'  "{key}": "{escaped_value}",\n\n')
-        
-        # Remove the last comma and add closing brace if there are any keys
-        if data:
-            f.seek(f.tell() - 3, 0)
-            f.write("\n\n}\n")
-        else:
-            f.write("}\n")
-    
-    print(f"Result saved to {output_file}")
+    if isinstance(rule, int) and not isinstance(rule, bool):
+        if not 1 <= rule <= len(values):
+            raise ValueError(f"Option {rule} is out of range 1-{len(values)}")
+        return rule - 1, f"option {rule}"
+    if rule == 'first':
+        return 0, 'first'
+    if rule == 'last':
+        return len(values) - 1, 'last'
+    if rule == 'longest':
+        # Ties go to the earliest value.
+        longest = max(range(len(values)), key=lambda i: (len(values[i] or ''), -i))
+        return longest, 'longest'
+    if isinstance(rule, str) and rule.startswith('locale:'):
+        if isinstance(reference, str) and reference in values:
+            return values.index(reference), rule
+        return 0, f"{rule} (no match, kept first)"
+    raise ValueError(f"Unknown resolution rule {rule!r}")
+
+def resolve_duplicates_batch(data: Dict[str, Any], policy: str, rules: Dict[str, Any] = None,
+                             locales: Dict[str, Dict[str, Any]] = None) -> Tuple[Dict[str, str], List[Dict[str, Any]]]:
+    """
+    Resolve every duplicate key without prompting, using the per-key `rules` where given and
+    `policy` otherwise. `locales` maps the file of each 'locale:<file>' rule to its parsed catalog.
+    Returns the resolved data and an audit list with one record per duplicate key.
+    """
+    rules = rules or {}
+    locales = locales or {}
+    resolved_data = {}
+    audit = []
+    for key, value in data.items():
+        if not isinstance(value, list):
+            resolved_data[key] = value
+            continue
+        rule = rules.get(key, policy)
+        reference = None
+        if isinstance(rule, str) and rule.startswith('locale:'):
+            reference = locales[rule[len('locale:'):]].get(key)
+        index, reason = choose_value(value, rule, reference)
+        resolved_data[key] = value[index]
+        audit.append({'key': key, 'options': value, 'chosen': index + 1, 'value': value[index], 'rule': reason})
+    return resolved_data, audit
+
+def load_rules(rules_file: str) -> Dict[str, Any]:
+    """
+    Read per-key overrides from a JSON object of key -> rule (see choose_value).
+    """
+    with open(rules_file, 'r', encoding='utf-8') as f:
+        rules = json.load(f)
+    if not isinstance(rules, dict):
+        raise ValueError(f"{rules_file} must contain a JSON object of key -> rule")
+    return rules
+
+def locale_files(policy: str, rules: Dict[str, Any]) -> List[str]:
+    """Return the catalogs referenced by 'locale:<file>' in the policy and rules."""
+    files = []
+    for rule in [policy, *rules.values()]:
+        if isinstance(rule, str) and rule.startswith('locale:') and rule[len('locale:'):] not in files:
+            files.append(rule[len('locale:'):])
+    return files
+
+def write_json5(data: Dict[str, str], input_file: str, output_file: str) -> None:
+    """
+    Write the resolved data to output_file as a minimal patch of input_file: dropped duplicates are
+    removed with their comments and everything else keeps its order, comments and formatting.
+    """
+    patch = sync_catalog(input_file, data, output_file)
+    print(f"Result saved to {output_file} ({len(patch.entries) - len(data)} duplicate entries removed)")
 
 def main():
-    parser = argparse.ArgumentParser(description='Resolve duplicate keys in JSON5 files interactively.')
-    parser.add_argument('input_file', help='Input JSON5 file path')
+    parser = argparse.ArgumentParser(description='Resolve duplicate keys in JSON5 files interactively or with a resolution policy.')
+    parser.add_argument('input_files', nargs='+', metavar='input_file', help='Input JSON5 file path(s)')
     parser.add_argument('--output', '-o', help='Output file path (default: resolved_output.json5)', 
                         default='resolved_output.json5')
+    parser.add_argument('--in-place', action='store_true', help='Write each resolved file back to its input path')
+    parser.add_argument('--policy', help="Resolve every duplicate without prompting: first, last, longest or locale:<file> "
+                                         "(the value that matches the key's value in another catalog)")
+    parser.add_argument('--rules', help='JSON file of per-key overrides: key -> first, last, longest, locale:<file> or a 1-based option number')
+    parser.add_argument('--audit', help='Write a JSON audit report of every resolution to this file')
     
     args = parser.parse_args()
+    if len(args.input_files) > 1 and not args.in_place:
+        parser.error('Multiple input files require --in-place')
+    if args.rules and not args.policy:
+        parser.error('--rules requires --policy')
+    if args.policy and args.policy not in POLICIES and not args.policy.startswith('locale:'):
+        parser.error(f"Unknown policy '{args.policy}'")
     
     try:
-        # Parse JSON5 file
-        data = parse_json5(args.input_file)
+        rules = load_rules(args.rules) if args.rules else {}
+        locales = {path: parse_json5(path) for path in locale_files(args.policy, rules)} if args.policy else {}
+        audit = {}
         
-        # Resolve duplicates
-        resolved_data = resolve_duplicates(data)
+        for input_file in args.input_files:
+            # Parse JSON5 file
+            data = parse_json5(input_file)
+            
+            # Resolve duplicates
+            if args.policy:
+                resolved_data, audit[input_file] = resolve_duplicates_batch(data, args.policy, rules, locales)
+                print(f"{input_file}: resolved {len(audit[input_file])} duplicate keys.")
+            else:
+                resolved_data = resolve_duplicates(data)
+            
+            # Write resolved data back to file
+            write_json5(resolved_data, input_file, input_file if args.in_place else args.output)
         
-        # Write resolved data back to file
-        write_json5(resolved_data, args.output)
+        if args.audit:
+            with open(args.audit, 'w', encoding='utf-8') as f:
+                json.dump(audit, f, ensure_ascii=False, indent=2)
+            print(f"Audit report saved to {args.audit}")
         
-    except FileNotFoundError:
-        print(f"Error: File {args.input_file} not found")
+    except FileNotFoundError as e:
+        print(f"Error: File {e.filename} not found")
         sys.exit(1)
     except Exception as e:
         print(f"Error: {str(e)}")
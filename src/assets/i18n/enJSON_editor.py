@@ -1,45 +1,74 @@
+import argparse
+
 import json5
-import re
+
+from json5_writer import CatalogPatch
 
 def generate_schemas(types, schema_pattern, text_pattern, type_mapping):
-    schemas = []
+    """
+    Return the sorted (key, text) pairs for every type. A type listed twice yields one key.
+    """
+    schemas = {}
     for type_name in types:
         schema = schema_pattern.replace('[]', f"{type_name.lower()}")
         human_readable_type = type_mapping.get(type_name, type_name)
         text = text_pattern.replace('[type]', human_readable_type)
-        schemas.append(f'  "{schema}": "{text}"')
-    return sorted(schemas)
+        schemas.setdefault(schema, text)
+    return sorted(schemas.items())
+
+def merge_keys(file_path, new_keys, on_existing='skip'):
+    """
+    Merge (key, text) pairs into a catalog in one pass over a key index of the file.
+    Keys that already exist are skipped, or with on_existing='update' get the new text (on the
+    occurrence the frontend uses, i.e. the last one). New keys are appended before the closing
+    brace and the rest of the file is left untouched. Returns (added, updated, skipped).
+    """
+    patch = CatalogPatch(file_path)
+    index = patch.occurrences()
+    added = updated = skipped = 0
+    for key, text in new_keys:
+        if key in index:
+            current = index[key][-1]
+            if on_existing == 'update' and current.value != text:
+                patch.replace(current, text)
+                updated += 1
+            else:
+                skipped += 1
+        else:
+            patch.add(key, text)
+            index[key] = []
+            added += 1
+    if patch.changed():
+        patch.write()
+    return added, updated, skipped
 
 def update_json_file(file_path, new_schemas):
-    # Read the existing JSON5 file
-    with open(file_path, 'r') as file:
-        content = file.read()
-
-    # Find the position to insert new schemas (just before the last closing brace)
-    insert_position = content.rfind('}')
-
-    # Check if we need to add a comma
-    need_comma = True
-    for i in range(insert_position - 1, -1, -1):
-        if content[i].strip():
-            if content[i] != ',':
-                need_comma = True
-            else:
-                need_comma = False
-            break
-        if content[i] == '\n':
-            need_comma = False
-            break
-
-    # Insert new schemas
-    updated_content = content[:insert_position]
-    if need_comma:
-        updated_content += ','
-    updated_content += '\n\n' + ',\n\n'.join(new_schemas) + '\n\n' + content[insert_position:]
-
-    # Write the updated content back to the file
-    with open(file_path, 'w') as file:
-        file.write(updated_content)
+    return merge_keys(file_path, new_schemas)
+
+def run_spec(spec_file, file_path=None, on_existing=None):
+    """
+    Generate the keys of every job in a batch spec and merge them into the catalog in one pass.
+    The spec is a JSON5 object:
+      {"file": "en.json5", "on_existing": "skip" | "update",
+       "jobs": [{"types": "e" | "r" | ["Type", ...], "schema": "x.[].z", "text": "[type] input"}, ...]}
+    """
+    with open(spec_file, 'r', encoding='utf-8') as f:
+        spec = json5.load(f)
+    type_mapping = get_type_mapping()
+    new_keys = {}
+    for number, job in enumerate(spec['jobs'], 1):
+        types = job['types'] if isinstance(job['types'], list) else get_types(job['types'])
+        if not types:
+            raise ValueError(f"Job {number}: invalid types {job['types']!r}")
+        for key, text in generate_schemas(types, job['schema'], job['text'], type_mapping):
+            if key in new_keys and new_keys[key] != text:
+                print(f"Job {number}: '{key}' was already generated by an earlier job. Keeping the first text.")
+            new_keys.setdefault(key, text)
+
+    file_path = file_path or spec.get('file', 'en.json5')
+    on_existing = on_existing or spec.get('on_existing', 'skip')
+    added, updated, skipped = merge_keys(file_path, new_keys.items(), on_existing=on_existing)
+    print(f"Generated {len(new_keys)} keys from {len(spec['jobs'])} jobs: {added} added, {updated} updated, {skipped} already present in {file_path}")
 
 def get_types(type_choice):
     if type_choice.lower() == 'e':
@@ -164,6 +193,16 @@ def get_type_mapping():
     }
 
 def main():
+    parser = argparse.ArgumentParser(description='Generate entity/relationship type keys and merge them into en.json5.')
+    parser.add_argument('--spec', help='JSON5 batch spec of generation jobs; runs without prompts')
+    parser.add_argument('--file', help='Catalog to merge into (default: en.json5, or the "file" of the spec)')
+    parser.add_argument('--update', action='store_true', help='Overwrite the text of keys that already exist instead of skipping them')
+    args = parser.parse_args()
+
+    if args.spec:
+        run_spec(args.spec, file_path=args.file, on_existing='update' if args.update else None)
+        return
+
     # Get user input
     type_choice = input("[E]ntity or [R]elationship Type? ").strip()
     schema_pattern = input("Enter the schema pattern (e.g., '[].y.z' or 'x.[].z' or 'x.y.[]'): ").strip()
@@ -183,10 +222,10 @@ def main():
     new_schemas = generate_schemas(types, schema_pattern, text_pattern, type_mapping)
 
     # Update JSON file
-    json_file_path = 'en.json5'
-    update_json_file(json_file_path, new_schemas)
+    json_file_path = args.file or 'en.json5'
+    added, updated, skipped = merge_keys(json_file_path, new_schemas, on_existing='update' if args.update else 'skip')
 
-    print(f"Generated and integrated {len(new_schemas)} new schemas into {json_file_path}")
+    print(f"Generated {len(new_schemas)} schemas for {json_file_path}: {added} added, {updated} updated, {skipped} already present")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+
+"""
+Find translation keys that no Angular source file uses, and optionally prune them from every locale.
+
+Every key of the reference catalog goes into an exact-match index, and every run of whole dotted
+segments that a key can be assembled from goes into a pattern index: prefixes (`item.page.`),
+infixes (`.form.`) and suffixes (`.listelement.badge`). The sources under src/ (*.ts and *.html,
+spec files excluded) are read once; each quoted or template-literal fragment is looked up in both
+indexes:
+
+  'item.page.title'                      -> the key itself is used
+  'search.filters.filter.' + name        -> every key under the prefix is used
+  `browse.metadata.${id}`                -> every key under the prefix is used
+  type + '.form.' + id                   -> every key containing the infix is used
+  `${type}.listelement.badge`            -> every key with the suffix is used
+  messagePrefix = 'item.edit.bitstreams' -> every key under the prefix is used (only for prefixes
+                                            with at least --min-prefix-depth segments)
+  'item.truncatable-part.show-' + state  -> every key starting with the text is used, even when the
+                                            text ends in the middle of a segment
+
+A literal that is directly followed by `+` or `${` is always treated as the start of a longer key,
+so a key is only reported (and pruned) if no such concatenation could produce it.
+
+Keys built in ways the scan cannot see can be kept with --keep/--rules glob patterns
+(e.g. `menu.section.*`). --prune removes the unused keys from all *.json5 catalogs as minimal
+in-place patches.
+"""
+
+import argparse
+import bisect
+import fnmatch
+import glob
+import json
+import os
+import re
+import sys
+from typing import Dict, Iterable, List, Optional, Set
+
+from json5_cache import load_entries
+from json5_writer import CatalogPatch
+
+I18N_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.normpath(os.path.join(I18N_DIR, '..', '..'))
+SOURCE_EXTENSIONS = ('.ts', '.html')
+
+# A fragment of a string or template literal: text right after a quote or the '}' closing a
+# template substitution, up to the next quote or '${'. The second group is set when the fragment
+# is concatenated with what follows: a template substitution or a closing quote and a '+'.
+_FRAGMENT_RE = re.compile(r'(?<=[\'"`}])([^\'"`\n{}]+)(?=(\$\{|[\'"`]\s*\+)?)(?=[\'"`]|\$\{)')
+
+
+class KeyIndex:
+    def __init__(self, keys: Iterable[str], min_prefix_depth: int = 2):
+        self.keys: Set[str] = set(keys)
+        self.min_prefix_depth = min_prefix_depth
+        self.patterns: Dict[str, List[str]] = {}
+        for key in self.keys:
+            segments = key.split('.')
+            for start in range(len(segments)):
+                for end in range(start + 1, len(segments) + 1):
+                    if start == 0 and end == len(segments):
+                        continue
+                    pattern = '.'.join(segments[start:end])
+                    pattern = ('.' if start else '') + pattern + ('.' if end < len(segments) else '')
+                    self.patterns.setdefault(pattern, []).append(key)
+        self.sorted_keys = sorted(self.keys)
+        self.used: Set[str] = set()
+        self.used_patterns: Dict[str, int] = {}
+
+    def match_prefix(self, prefix: str) -> None:
+        """Mark every key that starts with `prefix`, whether or not it ends on a segment boundary."""
+        start = bisect.bisect_left(self.sorted_keys, prefix)
+        end = start
+        while end < len(self.sorted_keys) and self.sorted_keys[end].startswith(prefix):
+            end += 1
+        if end > start and f"{prefix}*" not in self.used_patterns:
+            self.used_patterns[f"{prefix}*"] = end - start
+            self.used.update(self.sorted_keys[start:end])
+
+    def match(self, fragment: str, concatenated: bool = False) -> None:
+        if concatenated:
+            self.match_prefix(fragment)
+        fragment = fragment.strip()
+        if fragment in self.keys:
+            self.used.add(fragment)
+        pattern = fragment
+        if pattern not in self.patterns:
+            # A prefix held in a variable without its trailing dot, e.g. messagePrefix + '.title'.
+            if fragment.startswith('.') or fragment.count('.') + 1 < self.min_prefix_depth:
+                return
+            pattern = fragment + '.'
+            if pattern not in self.patterns:
+                return
+        if pattern not in self.used_patterns:
+            self.used_patterns[pattern] = len(self.patterns[pattern])
+            self.used.update(self.patterns[pattern])
+
+    def scan(self, text: str) -> None:
+        for match in _FRAGMENT_RE.finditer(text):
+            self.match(match.group(1), concatenated=bool(match.group(2)))
+
+    def keep(self, patterns: List[str]) -> Set[str]:
+        """Mark every key matching one of the glob patterns as used; return the newly kept keys."""
+        if not patterns:
+            return set()
+        combined = re.compile('|'.join(fnmatch.translate(pattern) for pattern in patterns))
+        kept = {key for key in self.keys - self.used if combined.match(key)}
+        self.used |= kept
+        return kept
+
+    def unused(self) -> List[str]:
+        return sorted(self.keys - self.used)
+
+def source_files(src_dir: str, include_specs: bool = False) -> Iterable[str]:
+    for root, dirs, files in os.walk(src_dir):
+        dirs[:] = [d for d in dirs if d not in ('node_modules', 'assets')]
+        for name in files:
+            if name.endswith(SOURCE_EXTENSIONS) and (include_specs or not name.endswith('.spec.ts')):
+                yield os.path.join(root, name)
+
+def load_patterns(rules_file: Optional[str]) -> List[str]:
+    """Read a JSON list of glob patterns of keys to keep."""
+    if not rules_file:
+        return []
+    with open(rules_file, 'r', encoding='utf-8') as f:
+        patterns = json.load(f)
+    if not isinstance(patterns, list) or not all(isinstance(p, str) for p in patterns):
+        raise ValueError(f"{rules_file} must contain a JSON list of key patterns")
+    return patterns
+
+def find_unused(reference_file: str, src_dir: str, patterns: List[str], min_prefix_depth: int = 2,
+                include_specs: bool = False) -> Dict[str, object]:
+    """
+    Scan the sources once against the key index of reference_file and return a report of the unused keys.
+    """
+    index = KeyIndex((entry.key for entry in load_entries(reference_file)), min_prefix_depth)
+    scanned = 0
+    for path in source_files(src_dir, include_specs):
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            index.scan(f.read())
+        scanned += 1
+    kept = index.keep(patterns)
+    return {
+        'reference': os.path.basename(reference_file),
+        'files_scanned': scanned,
+        'keys': len(index.keys),
+        'used': len(index.used),
+        'kept_by_rules': sorted(kept),
+        'dynamic_patterns': dict(sorted(index.used_patterns.items())),
+        'unused': index.unused(),
+    }
+
+def prune(i18n_dir: str, keys: Iterable[str]) -> Dict[str, int]:
+    """Remove the keys from every catalog in i18n_dir; returns the number of members removed per file."""
+    dead = set(keys)
+    removed = {}
+    for path in sorted(glob.glob(os.path.join(i18n_dir, '*.json5'))):
+        patch = CatalogPatch(path)
+        count = 0
+        for entry in patch.entries:
+            if entry.key in dead:
+                patch.remove(entry)
+                count += 1
+        if patch.changed():
+            patch.write()
+        removed[os.path.basename(path)] = count
+    return removed
+
+def main():
+    parser = argparse.ArgumentParser(description='Report or prune translation keys that the Angular sources do not use.')
+    parser.add_argument('--i18n-dir', default=I18N_DIR, help="Directory with the *.json5 catalogs (default: this script's directory)")
+    parser.add_argument('--reference', default='en.json5', help='Catalog in --i18n-dir whose keys are checked (default: en.json5)')
+    parser.add_argument('--src', default=SRC_DIR, help='Source directory to scan for *.ts and *.html files (default: src/)')
+    parser.add_argument('--include-specs', action='store_true', help='Also count keys used only in *.spec.ts files')
+    parser.add_argument('--keep', action='append', default=[], metavar='PATTERN',
+                        help="Glob pattern of keys to keep even if unused, e.g. 'menu.section.*' (repeatable)")
+    parser.add_argument('--rules', help='JSON file with a list of --keep patterns')
+    parser.add_argument('--min-prefix-depth', type=int, default=2,
+                        help='Segments a literal needs to count as a key prefix when it does not end with a dot (default: 2)')
+    parser.add_argument('--report', help='Write the JSON report to this file instead of listing the unused keys')
+    parser.add_argument('--prune', action='store_true', help='Remove the unused keys from every catalog in --i18n-dir')
+    args = parser.parse_args()
+
+    try:
+        patterns = args.keep + load_patterns(args.rules)
+        report = find_unused(os.path.join(args.i18n_dir, args.reference), args.src, patterns,
+                             args.min_prefix_depth, args.include_specs)
+    except FileNotFoundError as e:
+        print(f"Error: File {e.filename} not found")
+        sys.exit(1)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    else:
+        for key in report['unused']:
+            print(key)
+    print(f"{len(report['unused'])} of {report['keys']} keys in {report['reference']} are unused "
+          f"({report['files_scanned']} files scanned, {len(report['dynamic_patterns'])} dynamic patterns, "
+          f"{len(report['kept_by_rules'])} kept by rules)", file=sys.stderr)
+
+    if args.prune and report['unused']:
+        removed = prune(args.i18n_dir, report['unused'])
+        print(f"Removed {sum(removed.values())} entries from {sum(1 for count in removed.values() if count)} catalogs")
+
+if __name__ == "__main__":
+    main()
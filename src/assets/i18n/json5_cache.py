@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+"""
+Content-hash cache of parsed i18n catalogs.
+
+Parsing a catalog is keyed on the SHA-256 of its content, so every tool that reads the same
+unchanged file shares one parse: within a process through an in-memory memo, and across runs
+through marshal-serialized entry lists in CACHE_DIR. A changed file gets a new key and is
+re-parsed, and the cache files of its earlier contents are removed when the new one is written.
+
+CACHE_DIR defaults to `.cache/json5` in the repository root, outside src/assets, which webpack
+copies into the frontend bundle as a whole. Set JSON5_CACHE_DIR to move the on-disk cache, or to
+an empty string to disable it.
+"""
+
+import glob
+import hashlib
+import io
+import marshal
+import os
+import tempfile
+from typing import Any, Dict, List, Optional
+
+from json5_tokenizer import Entry, catalog_from_entries, iter_entries
+
+# Bump whenever the tokenizer output changes so that cached parses are not reused.
+CACHE_VERSION = 2
+
+CACHE_DIR = os.environ.get(
+    'JSON5_CACHE_DIR',
+    os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', '.cache', 'json5'))
+)
+
+_memo: Dict[bytes, List[Entry]] = {}
+
+
+def content_key(data: bytes) -> bytes:
+    digest = hashlib.sha256(data)
+    digest.update(b"\0" + str(CACHE_VERSION).encode('ascii'))
+    return digest.digest()
+
+
+def _read_cached(cache_file: str) -> Optional[List[Entry]]:
+    try:
+        with open(cache_file, 'rb') as f:
+            # marshal.loads on the whole content is much faster than marshal.load on the file.
+            records = marshal.loads(f.read())
+        return list(map(Entry._make, records))
+    except FileNotFoundError:
+        return None
+    except (EOFError, ValueError, TypeError):
+        # A truncated or foreign file: ignore it and parse again.
+        return None
+
+
+def _cache_prefix(cache_dir: str, filepath: str) -> str:
+    # Cache files are named after the catalog and a hash of its path, so that the entries of its
+    # earlier contents can be found and removed.
+    path = os.path.abspath(filepath)
+    return os.path.join(cache_dir, f"{os.path.basename(path)}.{hashlib.sha1(path.encode('utf-8')).hexdigest()[:8]}.")
+
+
+def _write_cached(cache_file: str, entries: List[Entry], stale_pattern: str) -> None:
+    directory = os.path.dirname(cache_file)
+    os.makedirs(directory, exist_ok=True)
+    for stale_file in glob.glob(stale_pattern):
+        if stale_file != cache_file:
+            os.unlink(stale_file)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(marshal.dumps([tuple(entry) for entry in entries]))
+        os.replace(tmp_path, cache_file)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+
+def load_entries(filepath: str, cache_dir: Optional[str] = None) -> List[Entry]:
+    """
+    Return the members of a catalog file in file order, parsing it only if its content has not
+    been seen before.
+    """
+    with open(filepath, 'rb') as f:
+        data = f.read()
+    key = content_key(data)
+    entries = _memo.get(key)
+    if entries is not None:
+        return entries
+
+    cache_dir = CACHE_DIR if cache_dir is None else cache_dir
+    prefix = _cache_prefix(cache_dir, filepath) if cache_dir else None
+    cache_file = f"{prefix}{key.hex()}.marshal" if cache_dir else None
+    if cache_file:
+        entries = _read_cached(cache_file)
+    if entries is None:
+        entries = list(iter_entries(io.StringIO(data.decode('utf-8'), newline=None)))
+        if cache_file:
+            try:
+                _write_cached(cache_file, entries, f"{glob.escape(prefix)}*.marshal")
+            except OSError:
+                # The cache is an optimisation only; a read-only checkout still works.
+                pass
+    _memo[key] = entries
+    return entries
+
+
+def load_catalog(filepath: str, cache_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Cached equivalent of json5_tokenizer.parse_catalog.
+    """
+    return catalog_from_entries(load_entries(filepath, cache_dir=cache_dir))
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+
+"""
+Single-pass tokenizer for the flat JSON5 translation catalogs in this directory.
+
+The catalogs are one top-level object of "key": "value" members with // comments, so instead of a
+general JSON5 parser this reads the file in chunks and matches one whole member at a time, keeping
+the source position of every part. It handles comments anywhere between tokens, single- and
+double-quoted strings, values that span several lines, escapes (including line continuations),
+unquoted keys and null/number/boolean literals. Duplicate keys are reported in file order.
+
+Offsets are character offsets into the decoded file content.
+"""
+
+import re
+from typing import Any, Dict, Iterable, Iterator, NamedTuple, Optional, TextIO, Tuple
+
+CHUNK_SIZE = 64 * 1024
+
+# Whitespace and comments between tokens.
+_GAP = r'(?:\s+|//[^\n]*|/\*[^*]*\*+(?:[^/*][^*]*\*+)*/)*'
+_STRING = r'"[^"\\]*(?:\\.[^"\\]*)*"|\'[^\'\\]*(?:\\.[^\'\\]*)*\''
+_SKIP_RE = re.compile(_GAP, re.S)
+_MEMBER_RE = re.compile(
+    rf'(?P<key>{_STRING}|[A-Za-z_$][\w$]*)'
+    rf'{_GAP}:{_GAP}'
+    rf'(?P<value>{_STRING}|[^\s,}}/:"\'{{\[\]]+)',
+    re.S
+)
+_ESCAPE_RE = re.compile(r'\\(?:u([0-9a-fA-F]{4})|x([0-9a-fA-F]{2})|(\r\n|[\s\S]))')
+_SIMPLE_ESCAPES = {
+    'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t', 'v': '\v', '0': '\0',
+    '\n': '', '\r\n': '', '\r': '', '\u2028': '', '\u2029': '',
+}
+_LITERALS = {'null': None, 'true': True, 'false': False}
+
+
+class JSON5SyntaxError(ValueError):
+    def __init__(self, message: str, line: int, column: int):
+        super().__init__(f"{message} at line {line}, column {column}")
+        self.line = line
+        self.column = column
+
+
+class Entry(NamedTuple):
+    """
+    One member of a catalog. Spans are (start, end) offsets; `leading` is where the text that
+    belongs to this member (blank lines and comments before the key) starts, and `end` is just
+    after its trailing comma, or after the value if there is none.
+    """
+    key: str
+    value: Any
+    raw_value: str
+    line: int
+    column: int
+    leading: int
+    key_span: Tuple[int, int]
+    value_span: Tuple[int, int]
+    comma_end: Optional[int]
+
+    @property
+    def end(self) -> int:
+        return self.comma_end if self.comma_end is not None else self.value_span[1]
+
+
+def _unescape(match) -> str:
+    code, byte, char = match.groups()
+    if code:
+        return chr(int(code, 16))
+    if byte:
+        return chr(int(byte, 16))
+    return _SIMPLE_ESCAPES.get(char, char)
+
+
+def decode_string(token: str) -> str:
+    """
+    Decode a quoted JSON5 string token into its value.
+    """
+    body = token[1:-1]
+    if '\\' not in body:
+        return body
+    # Combine UTF-16 surrogate pairs written as two \u escapes.
+    return _ESCAPE_RE.sub(_unescape, body).encode('utf-16', 'surrogatepass').decode('utf-16')
+
+
+def decode_value(token: str) -> Any:
+    if token[0] in '"\'':
+        return decode_string(token)
+    if token in _LITERALS:
+        return _LITERALS[token]
+    try:
+        return int(token, 0)
+    except ValueError:
+        return float(token)
+
+
+class _Reader:
+    """
+    Chunked buffer over a text stream that tracks absolute offsets and line numbers.
+    """
+
+    def __init__(self, stream: TextIO, chunk_size: int):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.base = 0
+        self.pos = 0
+        self.eof = False
+        self.line = 1
+        self.line_start = 0
+
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        if self.pos > self.chunk_size:
+            self.buffer = self.buffer[self.pos:]
+            self.base += self.pos
+            self.pos = 0
+        self.buffer += chunk
+        return True
+
+    def match(self, pattern):
+        # A match that reaches the end of the buffer might continue in the next chunk. Keep one
+        # character of lookahead so that a '/' at the end of a chunk is read as a comment start.
+        while True:
+            match = pattern.match(self.buffer, self.pos)
+            if match and (match.end() + 1 < len(self.buffer) or self.eof):
+                return match
+            if not self.fill():
+                return pattern.match(self.buffer, self.pos)
+
+    def skip(self) -> None:
+        """Advance past whitespace and comments."""
+        while True:
+            end = self.match(_SKIP_RE).end()
+            # A block comment that is not closed within the buffer ends the match at its '/*'.
+            if not self.buffer.startswith('/*', end) or not self.fill():
+                break
+        self.advance(end)
+
+    def advance(self, end: int) -> None:
+        newlines = self.buffer.count('\n', self.pos, end)
+        if newlines:
+            self.line += newlines
+            self.line_start = self.base + self.buffer.rindex('\n', self.pos, end) + 1
+        self.pos = end
+
+    def offset(self, index: int) -> int:
+        return self.base + index
+
+    def column(self) -> int:
+        return self.offset(self.pos) - self.line_start + 1
+
+    def peek(self) -> str:
+        if self.pos >= len(self.buffer):
+            self.fill()
+        return self.buffer[self.pos:self.pos + 1]
+
+    def error(self, message: str) -> JSON5SyntaxError:
+        return JSON5SyntaxError(message, self.line, self.column())
+
+
+def iter_entries(stream: TextIO, chunk_size: int = CHUNK_SIZE) -> Iterator[Entry]:
+    """
+    Yield every member of the catalog read from `stream`, in file order.
+    """
+    reader = _Reader(stream, chunk_size)
+    reader.skip()
+    if reader.peek() != '{':
+        raise reader.error("Expected '{'")
+    reader.advance(reader.pos + 1)
+    leading = reader.offset(reader.pos)
+
+    while True:
+        reader.skip()
+        if reader.peek() == '}':
+            reader.advance(reader.pos + 1)
+            break
+        match = reader.match(_MEMBER_RE)
+        if match is None:
+            raise reader.error("Expected a \"key\": value member or '}'" if reader.peek() else "Unexpected end of file")
+
+        line, column = reader.line, reader.column()
+        key_token, raw_value = match.group('key'), match.group('value')
+        key = decode_string(key_token) if key_token[0] in '"\'' else key_token
+        try:
+            value = decode_value(raw_value)
+        except ValueError:
+            reader.advance(match.start('value'))
+            raise reader.error(f"Invalid value {raw_value!r}")
+        key_span = (reader.offset(match.start('key')), reader.offset(match.end('key')))
+        value_span = (reader.offset(match.start('value')), reader.offset(match.end('value')))
+        reader.advance(match.end())
+        # The comma is matched on its own: the gap before it can cross a chunk boundary, and an
+        # optional comma at the end of _MEMBER_RE would then silently match without it.
+        reader.skip()
+        comma_end = None
+        if reader.peek() == ',':
+            reader.advance(reader.pos + 1)
+            comma_end = reader.offset(reader.pos)
+        entry = Entry(
+            key=key,
+            value=value,
+            raw_value=raw_value,
+            line=line,
+            column=column,
+            leading=leading,
+            key_span=key_span,
+            value_span=value_span,
+            comma_end=comma_end,
+        )
+        yield entry
+        leading = entry.end
+
+        if comma_end is None:
+            if reader.peek() != '}':
+                raise reader.error("Expected ',' or '}'")
+
+    reader.skip()
+    if reader.peek():
+        raise reader.error("Unexpected content after the closing '}'")
+
+
+def skip_gap(text: str, pos: int) -> int:
+    """
+    Return the offset of the first character at or after `pos` that is not whitespace or a comment.
+    """
+    return _SKIP_RE.match(text, pos).end()
+
+
+def parse_entries(filepath: str) -> Iterator[Entry]:
+    """
+    Yield the members of a catalog file, in file order.
+    """
+    with open(filepath, 'r', encoding='utf-8') as f:
+        yield from iter_entries(f)
+
+
+def parse_catalog(filepath: str) -> Dict[str, Any]:
+    """
+    Parse a catalog into a dictionary of key -> value. A key that occurs more than once maps to
+    the list of its values in file order.
+    """
+    return catalog_from_entries(parse_entries(filepath))
+
+
+def catalog_from_entries(entries: Iterable[Entry]) -> Dict[str, Any]:
+    result = {}
+    for entry in entries:
+        if entry.key in result:
+            if isinstance(result[entry.key], list):
+                result[entry.key].append(entry.value)
+            else:
+                result[entry.key] = [result[entry.key], entry.value]
+        else:
+            result[entry.key] = entry.value
+    return result
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+"""
+Minimal-diff writer for the JSON5 translation catalogs.
+
+Instead of re-serializing a whole catalog, a CatalogPatch edits the original text in place:
+removed members are cut out together with their leading comments, changed values have only their
+value token replaced, and new members are appended before the closing brace. Key order, comments
+and formatting of everything else are kept, so a rewrite only shows the changed keys in a diff.
+The result is written to a temporary file and moved into place atomically.
+"""
+
+import io
+import json
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, List, Tuple
+
+from json5_tokenizer import Entry, iter_entries, skip_gap
+
+
+def format_value(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False)
+
+
+class CatalogPatch:
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        # newline='' keeps \r\n line endings, so offsets match the bytes written back.
+        with open(filepath, 'r', encoding='utf-8', newline='') as f:
+            self.content = f.read()
+        self.newline = '\r\n' if '\r\n' in self.content else '\n'
+        self.entries: List[Entry] = list(iter_entries(io.StringIO(self.content, newline='')))
+        self._edits: Dict[int, Tuple[int, int, str]] = {}
+        self._additions: List[Tuple[str, Any]] = []
+
+    def occurrences(self) -> Dict[str, List[Entry]]:
+        """Group the members by key, in file order."""
+        grouped: Dict[str, List[Entry]] = {}
+        for entry in self.entries:
+            grouped.setdefault(entry.key, []).append(entry)
+        return grouped
+
+    def remove(self, entry: Entry) -> None:
+        """Cut a member out together with the blank lines and comments that precede it."""
+        self._edits[entry.leading] = (entry.leading, entry.end, '')
+
+    def replace(self, entry: Entry, value: Any) -> None:
+        """Replace the value of one member if it changed."""
+        if entry.value != value or type(entry.value) is not type(value):
+            start, end = entry.value_span
+            self._edits[start] = (start, end, format_value(value))
+
+    def add(self, key: str, value: Any) -> None:
+        self._additions.append((key, value))
+
+    def changed(self) -> bool:
+        return bool(self._edits or self._additions)
+
+    def render(self) -> str:
+        edits = list(self._edits.values())
+        kept = [entry for entry in self.entries if entry.leading not in self._edits or self._edits[entry.leading][2]]
+        # Follow the file's style: the member that ends up last gets a trailing comma only if the
+        # original last member had one.
+        trailing = bool(self.entries) and self.entries[-1].comma_end is not None
+        last = kept[-1] if kept else None
+        if self._additions:
+            if last is not None:
+                position, indent = last.end, ' ' * (last.column - 1)
+            else:
+                position, indent = self.content.index('{', skip_gap(self.content, 0)) + 1, '  '
+            separator = ',' if last is not None and last.comma_end is None else ''
+            members = [f'{indent}{format_value(key)}: {format_value(value)}' for key, value in self._additions]
+            text = separator + ','.join(f'{self.newline}{self.newline}{member}' for member in members) + (',' if trailing else '')
+            edits.append((position, position, text))
+        elif last is not None and last is not self.entries[-1] and not trailing and last.comma_end is not None:
+            # The original last member was removed; drop the comma of the new last one.
+            edits.append((last.comma_end - 1, last.comma_end, ''))
+        edits.sort()
+
+        parts = []
+        cursor = 0
+        for start, end, replacement in edits:
+            if start < cursor:
+                raise ValueError(f"Overlapping edits at offset {start} in {self.filepath}")
+            parts.append(self.content[cursor:start])
+            parts.append(replacement)
+            cursor = end
+        parts.append(self.content[cursor:])
+        return ''.join(parts)
+
+    def write(self, output_file: str = None) -> None:
+        """Atomically write the patched catalog to output_file (default: the source file)."""
+        write_atomic(output_file or self.filepath, self.render(), mode_from=self.filepath)
+
+
+def write_atomic(path: str, content: str, mode_from: str = None) -> None:
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.json5')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            f.write(content)
+        if mode_from and os.path.exists(mode_from):
+            shutil.copymode(mode_from, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+
+def sync_catalog(source_file: str, data: Dict[str, Any], output_file: str = None) -> CatalogPatch:
+    """
+    Make the catalog in source_file hold exactly `data` with as few edits as possible and write it
+    to output_file (default: in place). For a duplicated key the first occurrence whose value equals
+    the new value is kept and the others are removed. Returns the applied patch.
+    """
+    patch = CatalogPatch(source_file)
+    existing = patch.occurrences()
+    for key, occurrences in existing.items():
+        if key not in data:
+            for occurrence in occurrences:
+                patch.remove(occurrence)
+            continue
+        value = data[key]
+        keep = next((o for o in occurrences if o.value == value and type(o.value) is type(value)), occurrences[0])
+        patch.replace(keep, value)
+        for occurrence in occurrences:
+            if occurrence is not keep:
+                patch.remove(occurrence)
+    for key, value in data.items():
+        if key not in existing:
+            patch.add(key, value)
+    patch.write(output_file)
+    return patch
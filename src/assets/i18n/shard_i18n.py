@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+
+"""
+Split the JSON5 translation catalogs into per-namespace JSON shards for lazy loading.
+
+Every key is assigned to a shard by its top-level prefix (the part before the first '.', e.g.
+`submission`, `admin`, `item`). Prefixes with fewer than --min-keys keys in the reference catalog
+are grouped into one `_common` shard, and every locale uses the reference's layout so that a
+namespace lives in the same shard in every language. Shards are minified plain JSON, named with a
+content hash, and listed in a manifest.json that maps prefixes to shards and shards to files:
+
+  {"reference": "en", "common": "_common",
+   "prefixes": {"submission": "submission", "chips": "_common", ...},
+   "locales": {"de": {"submission": {"file": "de/submission.3f2a9c1d.json", "keys": 448, "bytes": 51234}, ...}}}
+
+Run it after the frontend build; by default the shards go to dist/browser/assets/i18n/shards.
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+from typing import Any, Dict
+
+from json5_cache import load_entries
+
+I18N_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT_DIR = os.path.join(I18N_DIR, '..', '..', '..', 'dist', 'browser', 'assets', 'i18n', 'shards')
+COMMON_SHARD = '_common'
+
+def key_prefix(key: str) -> str:
+    return key.split('.', 1)[0]
+
+def load_messages(filepath: str) -> Dict[str, Any]:
+    """
+    Return the catalog as the frontend sees it: keys in first-seen order, duplicates keep the last value.
+    """
+    messages = {}
+    for entry in load_entries(filepath):
+        messages[entry.key] = entry.value
+    return messages
+
+def plan_layout(reference: Dict[str, Any], min_keys: int) -> Dict[str, str]:
+    """
+    Map every top-level prefix of the reference catalog to the shard that holds it.
+    """
+    counts: Dict[str, int] = {}
+    for key in reference:
+        prefix = key_prefix(key)
+        counts[prefix] = counts.get(prefix, 0) + 1
+    return {prefix: prefix if count >= min_keys else COMMON_SHARD for prefix, count in counts.items()}
+
+def split_catalog(messages: Dict[str, Any], layout: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+    shards: Dict[str, Dict[str, Any]] = {}
+    for key, value in messages.items():
+        # Keys under a prefix the reference does not know go to the common shard.
+        shard = layout.get(key_prefix(key), COMMON_SHARD)
+        shards.setdefault(shard, {})[key] = value
+    return shards
+
+def write_shards(locale: str, shards: Dict[str, Dict[str, Any]], output_dir: str, hashed: bool = True) -> Dict[str, Dict[str, Any]]:
+    """
+    Write one locale's shards as minified JSON and return their manifest entries.
+    Stale shard files of the locale from earlier runs are removed.
+    """
+    locale_dir = os.path.join(output_dir, locale)
+    os.makedirs(locale_dir, exist_ok=True)
+    manifest = {}
+    for shard, messages in sorted(shards.items()):
+        data = json.dumps(messages, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        suffix = f".{hashlib.sha256(data).hexdigest()[:8]}" if hashed else ''
+        filename = f"{shard}{suffix}.json"
+        with open(os.path.join(locale_dir, filename), 'wb') as f:
+            f.write(data)
+        manifest[shard] = {'file': f"{locale}/{filename}", 'keys': len(messages), 'bytes': len(data)}
+
+    current = {os.path.basename(entry['file']) for entry in manifest.values()}
+    for path in glob.glob(os.path.join(locale_dir, '*.json')):
+        if os.path.basename(path) not in current:
+            os.remove(path)
+    return manifest
+
+def build_shards(i18n_dir: str, output_dir: str, reference_name: str = 'en', min_keys: int = 20, hashed: bool = True) -> Dict[str, Any]:
+    """
+    Shard every *.json5 catalog in i18n_dir into output_dir and write manifest.json. Returns the manifest.
+    """
+    reference = load_messages(os.path.join(i18n_dir, f"{reference_name}.json5"))
+    layout = plan_layout(reference, min_keys)
+    manifest = {'reference': reference_name, 'common': COMMON_SHARD, 'prefixes': layout, 'locales': {}}
+
+    for path in sorted(glob.glob(os.path.join(i18n_dir, '*.json5'))):
+        locale = os.path.splitext(os.path.basename(path))[0]
+        messages = reference if locale == reference_name else load_messages(path)
+        manifest['locales'][locale] = write_shards(locale, split_catalog(messages, layout), output_dir, hashed=hashed)
+
+    with open(os.path.join(output_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(',', ':'))
+    return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description='Split the i18n catalogs into per-prefix JSON shards with a manifest.')
+    parser.add_argument('--i18n-dir', default=I18N_DIR, help="Directory with the *.json5 catalogs (default: this script's directory)")
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR, help='Where to write the shards and manifest.json (default: dist/browser/assets/i18n/shards)')
+    parser.add_argument('--reference', default='en', help='Locale whose prefixes define the shard layout (default: en)')
+    parser.add_argument('--min-keys', type=int, default=20, help='Prefixes with fewer keys are grouped into the common shard (default: 20)')
+    parser.add_argument('--no-hash', action='store_true', help='Do not add content hashes to the shard file names')
+    args = parser.parse_args()
+
+    try:
+        manifest = build_shards(args.i18n_dir, os.path.normpath(args.output_dir), args.reference, args.min_keys, hashed=not args.no_hash)
+    except FileNotFoundError as e:
+        print(f"Error: File {e.filename} not found")
+        sys.exit(1)
+
+    reference = manifest['locales'][args.reference]
+    largest = max(reference.values(), key=lambda shard: shard['bytes'])
+    print(f"Wrote {len(reference)} shards for each of {len(manifest['locales'])} locales to {os.path.normpath(args.output_dir)}")
+    print(f"Largest {args.reference} shard: {largest['file']} ({largest['bytes']} bytes); "
+          f"whole catalog: {sum(shard['bytes'] for shard in reference.values())} bytes")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+
+import unittest
+
+from find_unused_keys import KeyIndex
+
+KEYS = [
+    'item.truncatable-part.show-less',
+    'item.truncatable-part.show-more',
+    'item.truncatable-part.title',
+    'item.page.title',
+    'item.page.abstract',
+]
+
+
+class KeyIndexTest(unittest.TestCase):
+    def scan(self, text):
+        index = KeyIndex(KEYS)
+        index.scan(text)
+        return index
+
+    def test_concatenated_prefix_ending_mid_segment(self):
+        index = self.scan("{{ 'item.truncatable-part.show-' + (isExpanded ? 'less' : 'more') | translate }}")
+        self.assertEqual(index.unused(), ['item.page.abstract', 'item.page.title', 'item.truncatable-part.title'])
+
+    def test_template_prefix_ending_mid_segment(self):
+        index = self.scan("const key = `item.truncatable-part.show-${state}`;")
+        self.assertNotIn('item.truncatable-part.show-less', index.unused())
+        self.assertNotIn('item.truncatable-part.show-more', index.unused())
+        self.assertIn('item.truncatable-part.title', index.unused())
+
+    def test_literal_without_concatenation_is_not_a_raw_prefix(self):
+        index = self.scan("this.label = 'item.truncatable-part.show-';")
+        self.assertEqual(index.unused(), sorted(KEYS))
+
+    def test_exact_key(self):
+        index = self.scan("<h1>{{ \"item.page.title\" | translate }}</h1>")
+        self.assertEqual(index.used, {'item.page.title'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,41 +1,20 @@
 #!/usr/bin/env python3
 
+import argparse
+import glob
 import json
+import os
 import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from json5_cache import load_catalog
+
+PLACEHOLDER_PATTERN = re.compile(r'\{\{\s*([^{}\s]+)\s*\}\}')
 
 def parse_json5_with_duplicates(filepath):
     """Parse a JSON5 file and return a dictionary that preserves duplicate keys."""
-    result = {}
-    
-    with open(filepath, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Remove comments
-    content = re.sub(r'//.*?\n', '\n', content)
-    
-    # Parse key-value pairs
-    lines = content.split('\n')
-    
-    for line in lines:
-        line = line.strip()
-        if not line or line in ['{', '}']:
-            continue
-            
-        key_match = re.match(r'"([^"]+)":\s*"(.*)"(?:,)?$', line)
-        if key_match:
-            key = key_match.group(1)
-            value = key_match.group(2)
-            
-            if key in result:
-                if isinstance(result[key], list):
-                    result[key].append(value)
-                else:
-                    result[key] = [result[key], value]
-            else:
-                result[key] = value
-    
-    return result
+    return load_catalog(filepath)
 
 def compare_files(original_file, cleaned_file):
     """Compare original and cleaned files considering duplicates."""
@@ -110,12 +89,108 @@ def compare_files(original_file, cleaned_file):
     else:
         print("\n❌ VALIDATION FAILED: Found issues with the cleaned file")
 
-if __name__ == "__main__":
-    if len(sys.argv) != 3:
+def placeholders(value):
+    """Return the set of {{ var }} names used in a value."""
+    if not isinstance(value, str):
+        return set()
+    return set(PLACEHOLDER_PATTERN.findall(value))
+
+def effective_value(value):
+    """The value the frontend sees for a key: the last one if the key is duplicated."""
+    return value[-1] if isinstance(value, list) else value
+
+_reference = None
+
+def _init_worker(reference_file):
+    global _reference
+    _reference = load_catalog(reference_file)
+
+def check_locale(locale_file):
+    """Check one catalog against the reference catalog loaded by _init_worker."""
+    data = load_catalog(locale_file)
+    mismatches = {}
+    for key, value in data.items():
+        if key in _reference:
+            expected = placeholders(effective_value(_reference[key]))
+            found = placeholders(effective_value(value))
+            if expected != found:
+                mismatches[key] = {'reference': sorted(expected), 'locale': sorted(found)}
+    return os.path.basename(locale_file), {
+        'keys': len(data),
+        'missing': sorted(key for key in _reference if key not in data),
+        'orphans': sorted(key for key in data if key not in _reference),
+        'duplicates': {key: value for key, value in data.items() if isinstance(value, list)},
+        'placeholder_mismatches': mismatches,
+    }
+
+def check_all_locales(i18n_dir, reference_name='en.json5', workers=None):
+    """Check every catalog in i18n_dir against the reference catalog in a process pool."""
+    reference_file = os.path.join(i18n_dir, reference_name)
+    reference = load_catalog(reference_file)
+    locale_files = sorted(
+        path for path in glob.glob(os.path.join(i18n_dir, '*.json5'))
+        if os.path.basename(path) != reference_name
+    )
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(reference_file,)) as executor:
+        locales = dict(executor.map(check_locale, locale_files))
+
+    summary = {
+        name: {
+            'missing': len(result['missing']),
+            'orphans': len(result['orphans']),
+            'duplicates': len(result['duplicates']),
+            'placeholder_mismatches': len(result['placeholder_mismatches']),
+        }
+        for name, result in locales.items()
+    }
+    return {
+        'reference': reference_name,
+        'reference_keys': len(reference),
+        'reference_duplicates': {key: value for key, value in reference.items() if isinstance(value, list)},
+        'summary': summary,
+        'locales': locales,
+    }
+
+def print_summary(report):
+    print(f"Reference {report['reference']}: {report['reference_keys']} keys, {len(report['reference_duplicates'])} duplicated")
+    print(f"{'Locale':<16}{'Missing':>9}{'Orphans':>9}{'Duplicates':>12}{'Placeholders':>14}")
+    for name, counts in report['summary'].items():
+        print(f"{name:<16}{counts['missing']:>9}{counts['orphans']:>9}{counts['duplicates']:>12}{counts['placeholder_mismatches']:>14}")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Validate a cleaned JSON5 file against the original, or check every locale against en.json5.",
+        usage="python validate_json5.py original.json5 cleaned.json5\n"
+              "       python validate_json5.py --all-locales [--report REPORT.json]"
+    )
+    parser.add_argument('original', nargs='?', help='Original JSON5 file')
+    parser.add_argument('cleaned', nargs='?', help='Cleaned JSON5 file')
+    parser.add_argument('--all-locales', action='store_true',
+                        help='Check every catalog for missing, orphan and duplicate keys and {{ var }} mismatches against the reference')
+    parser.add_argument('--i18n-dir', default=os.path.dirname(os.path.abspath(__file__)),
+                        help='Directory with the *.json5 catalogs (default: this script\'s directory)')
+    parser.add_argument('--reference', default='en.json5', help='Reference catalog in --i18n-dir (default: en.json5)')
+    parser.add_argument('--report', help='Write the JSON report to this file instead of stdout and print a summary')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: one per CPU)')
+    args = parser.parse_args()
+
+    if args.all_locales:
+        report = check_all_locales(args.i18n_dir, args.reference, workers=args.workers)
+        if args.report:
+            with open(args.report, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print_summary(report)
+            print(f"Report saved to {args.report}")
+        else:
+            json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+            print()
+        return
+
+    if not args.original or not args.cleaned:
         print("Usage: python validate_json5.py original.json5 cleaned.json5")
         sys.exit(1)
-    
-    original_file = sys.argv[1]
-    cleaned_file = sys.argv[2]
-    
-    compare_files(original_file, cleaned_file)
\ No newline at end of file
+
+    compare_files(args.original, args.cleaned)
+
+if __name__ == "__main__":
+    main()